@@ -0,0 +1,43 @@
+from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+
+from .models import RequestProfile
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("created", "method", "path", "view_name", "user",
+                    "status_code", "duration", "samples")
+    list_filter = ("view_name", "created")
+    search_fields = ("path",)
+    list_select_related = ("user",)
+    empty_value_display = "-пусто-"
+    readonly_fields = ("created", "method", "path", "view_name", "user",
+                       "status_code", "duration", "samples", "flame_graph",
+                       "query_table")
+    exclude = ("stacks", "queries")
+
+    def has_add_permission(self, request):
+        # Профили снимаются только с живых запросов
+        return False
+
+    def flame_graph(self, profile):
+        url = reverse('core:profile_stacks', args=[profile.pk])
+        return format_html(
+            '<a href="{}">свёрнутые стеки</a> — для flamegraph.pl '
+            'или speedscope.app', url)
+    flame_graph.short_description = "Flame graph"
+
+    def query_table(self, profile):
+        rows = format_html_join(
+            '', '<tr><td>{:.1f}</td><td>{}</td><td><code>{}</code></td>'
+                '</tr>',
+            ((query['duration'] * 1000, query.get('database', 'default'),
+              query['sql'])
+             for query in profile.query_list))
+        return format_html('<table><tr><th>мс</th><th>БД</th><th>SQL</th>'
+                           '</tr>{}</table>', rows)
+    query_table.short_description = "Запросы к БД"
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
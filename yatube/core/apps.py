@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from . import db, profiling
+        connection_created.connect(db.configure_sqlite,
+                                   dispatch_uid='core.configure_sqlite')
+        connection_created.connect(profiling.watch_connection,
+                                   dispatch_uid='core.watch_connection')
+        profiling.install()
@@ -0,0 +1,287 @@
+"""Кэш в файле SQLite, общий для всех процессов-воркеров на машине.
+
+LocMemCache у каждого воркера gunicorn свой: данные прогреваются
+заново в каждом процессе, а счётчики поколений (``posts.cache``) из одного
+процесса не видны в другом. Этот бэкенд хранит кэш в одном файле SQLite
+в режиме WAL: читатели не блокируют друг друга и писателя, а внешний
+сервис вроде memcached не нужен.
+
+* ``incr`` выполняется под блокировкой записи (``BEGIN IMMEDIATE``)
+  и атомарен между процессами;
+* ``get_many``/``set_many`` — один запрос или одна транзакция;
+* при превышении ``MAX_ENTRIES`` вытесняются давно не читавшиеся ключи
+  (LRU с точностью ``TOUCH_INTERVAL`` секунд, чтобы чтения не писали
+  в файл на каждый запрос).
+
+Настройка::
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }}
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Ограничение SQLite на число параметров в запросе
+MAX_VARIABLES = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+
+
+def _chunks(items, size=MAX_VARIABLES):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get('OPTIONS', {})
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 1))
+        self._cull_every = int(options.get('CULL_EVERY', 64))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    # Соединение
+
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self._path,
+                                         timeout=self._busy_timeout,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+            local.writes = 0
+        return local.connection
+
+    def _write(self, operation):
+        """Выполняет operation(conn) в одной транзакции с блокировкой записи.
+
+        ``BEGIN IMMEDIATE`` сразу берёт блокировку записи, поэтому
+        «прочитать-изменить-записать» внутри атомарно между процессами.
+        """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = operation(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    # Сериализация
+
+    @staticmethod
+    def _encode(value):
+        # bool — тоже int, но его нужно вернуть как bool
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    # Вытеснение
+
+    def _after_write(self, count=1):
+        local = self._local
+        local.writes += count
+        if local.writes >= self._cull_every:
+            local.writes = 0
+            self._cull()
+
+    def _cull(self):
+        def cull(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+                (time.time(),))
+            (count,) = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()
+            if count <= self._max_entries:
+                return
+            # Как и в других бэкендах Django: удаляем 1/CULL_FREQUENCY
+            # ключей, но сначала те, что дольше всего не читали
+            excess = count - self._max_entries
+            evict = max(excess, count // max(self._cull_frequency, 1))
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (evict,))
+        self._write(cull)
+
+    # API кэша
+
+    def _fetch(self, keys):
+        """Живые значения для ключей; заодно отмечает чтение для LRU."""
+        connection = self._connection()
+        now = time.time()
+        found = {}
+        stale = []
+        for chunk in _chunks(keys):
+            rows = connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                'WHERE key IN ({})'.format(', '.join('?' * len(chunk))),
+                chunk)
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = value
+                if now - accessed > self._touch_interval:
+                    stale.append(key)
+        if stale:
+            for chunk in _chunks(stale):
+                connection.execute(
+                    'UPDATE cache SET accessed = ? WHERE key IN ({})'.format(
+                        ', '.join('?' * len(chunk))),
+                    [now] + chunk)
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        found = self._fetch([key])
+        if key not in found:
+            return default
+        return self._decode(found[key])
+
+    def get_many(self, keys, version=None):
+        made = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made[made_key] = key
+        found = self._fetch(list(made))
+        return {made[key]: self._decode(value)
+                for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (key, self._encode(value), self.get_backend_timeout(timeout),
+             time.time()))
+        self._after_write()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, self._encode(value), expires, now))
+
+        def insert(connection):
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', rows)
+        self._write(insert)
+        self._after_write(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+
+        def insert(connection):
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now))
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (key, self._encode(value), self.get_backend_timeout(timeout),
+                 now))
+            return cursor.rowcount == 1
+        added = self._write(insert)
+        if added:
+            self._after_write()
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+
+        def increment(connection):
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, now)).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._encode(value), now, key))
+            return value
+        return self._write(increment)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key in self._fetch([key])
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+
+        def delete(connection):
+            for chunk in _chunks(keys):
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN ({})'.format(
+                        ', '.join('?' * len(chunk))), chunk)
+        self._write(delete)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами: открывать файл
+        # и выполнять PRAGMA на каждый запрос дороже, чем держать его
+        pass
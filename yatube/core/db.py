@@ -0,0 +1,31 @@
+"""Production-настройки соединений SQLite.
+
+По умолчанию SQLite пишет журнал отката: пока пишет ``new_post``, чтения
+ленты ждут, а при коротком таймауте падают с «database is locked».
+Каждому новому соединению ставятся ``SQLITE_PRAGMAS`` из настроек:
+
+* ``journal_mode=WAL`` — читатели не блокируют писателя и друг друга;
+* ``synchronous=NORMAL`` — в WAL безопасно и без fsync на каждый коммит;
+* ``mmap_size``, ``cache_size`` — страницы БД читаются из памяти;
+* ``temp_store=MEMORY`` — временные B-деревья сортировок в памяти.
+
+Ожидание блокировки задаёт ``OPTIONS['timeout']`` в DATABASES, а
+соединения переиспользует ``CONN_MAX_AGE``.
+"""
+from django.conf import settings
+
+
+def pragma_statements(pragmas=None):
+    if pragmas is None:
+        pragmas = settings.SQLITE_PRAGMAS
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Приёмник connection_created: прагмы для нового соединения SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через sqlite3: запросы настройки не нужны ни в профиле,
+    # ни в журнале медленных запросов
+    for statement in pragma_statements():
+        connection.connection.execute(statement)
@@ -0,0 +1,116 @@
+"""Групповой коммит мелких записей.
+
+Каждый комментарий или подписка — отдельная транзакция, а у SQLite
+коммит — это синхронизация журнала и единственный писатель: во время
+«шторма» комментариев запросы стоят в очереди друг за другом. При
+``GROUP_COMMIT = True`` такие записи выполняет один поток-писатель
+процесса: он копит операции ``GROUP_COMMIT_WINDOW`` секунд (не больше
+``GROUP_COMMIT_MAX_BATCH``), выполняет их в одной транзакции и будит
+запросы после её коммита. Каждая операция идёт в своей точке
+сохранения, поэтому ошибка одной (например, нарушение уникальности)
+возвращается только её запросу и не откатывает остальные.
+
+Сигналы моделей и ``on_commit`` выполняются в потоке-писателе так же,
+как выполнялись бы в запросе.
+"""
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from time import perf_counter
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from . import routers
+
+logger = logging.getLogger(__name__)
+
+
+class Writer:
+    """Поток-писатель и очередь операций к нему.
+
+    Поток запускается при первой операции и заново после fork.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owner = None
+        self._queue = None
+        self.batches = 0
+        self.writes = 0
+
+    def submit(self, func, *args, **kwargs):
+        """Ставит ``func(*args, **kwargs)`` в очередь; возвращает Future."""
+        future = Future()
+        self._get_queue().put((future, func, args, kwargs))
+        return future
+
+    def _get_queue(self):
+        with self._lock:
+            if self._owner != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, args=(self._queue,),
+                                 name='group-commit', daemon=True).start()
+                self._owner = os.getpid()
+            return self._queue
+
+    def _run(self, operations):
+        while True:
+            batch = [operations.get()]
+            deadline = perf_counter() + settings.GROUP_COMMIT_WINDOW
+            while len(batch) < settings.GROUP_COMMIT_MAX_BATCH:
+                remaining = deadline - perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(operations.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Соединение потока живёт не дольше CONN_MAX_AGE
+            close_old_connections()
+            self._commit(batch)
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with transaction.atomic():
+                for future, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic():
+                            results.append((future, func(*args, **kwargs),
+                                            None))
+                    except Exception as error:
+                        results.append((future, None, error))
+        except Exception as error:
+            logger.exception('Групповой коммит из %s операций не удался',
+                             len(batch))
+            connection.close()
+            for future, *_ in batch:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+writer = Writer()
+
+
+def run(func, *args, **kwargs):
+    """Выполняет запись и возвращает её результат после коммита.
+
+    Без ``GROUP_COMMIT`` или внутри уже открытой транзакции (её данные
+    не видны писателю) ``func`` вызывается сразу в текущем потоке.
+    """
+    if not settings.GROUP_COMMIT or connection.in_atomic_block:
+        return func(*args, **kwargs)
+    # Поток-писатель не видит переменных контекста запроса
+    routers.note_write()
+    future = writer.submit(func, *args, **kwargs)
+    return future.result(settings.GROUP_COMMIT_TIMEOUT)
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+def make_backends(directory):
+    return {
+        'locmem': lambda: LocMemCache('bench', {
+            'OPTIONS': {'MAX_ENTRIES': 100000}}),
+        'sqlite': lambda: SQLiteCache(
+            os.path.join(directory, 'bench.sqlite3'),
+            {'OPTIONS': {'MAX_ENTRIES': 100000}}),
+    }
+
+
+def timed(operation, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        operation(i)
+    return iterations / (time.perf_counter() - started)
+
+
+def warm_worker(factory, keys, queue):
+    """Воркер читает общий набор ключей и заполняет промахи."""
+    backend = factory()
+    hits = 0
+    for key in keys:
+        if backend.get(key) is not None:
+            hits += 1
+        else:
+            backend.set(key, 'x' * 512)
+    queue.put(hits)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLiteCache с LocMemCache: операции в секунду '
+            'и доля попаданий при нескольких процессах-воркерах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        directory = tempfile.mkdtemp()
+        try:
+            backends = make_backends(directory)
+            self.stdout.write('Операций в секунду (один процесс):')
+            for name, factory in backends.items():
+                self.stdout.write(
+                    f'  {name:<8} ' + self.throughput(factory(), iterations))
+            self.stdout.write(
+                f'Доля попаданий, {options["processes"]} воркера '
+                'читают одни и те же ключи:')
+            for name, factory in backends.items():
+                ratio = self.shared_hit_ratio(
+                    factory, options['processes'], iterations // 10)
+                self.stdout.write(f'  {name:<8} {ratio:.0%}')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def throughput(self, backend, iterations):
+        value = {'text': 'x' * 512}
+        keys = [f'key{i}' for i in range(10)]
+        backend.set('counter', 0)
+        results = {
+            'set': timed(lambda i: backend.set(f'key{i}', value), iterations),
+            'get': timed(lambda i: backend.get(f'key{i}'), iterations),
+            'get_many': timed(lambda i: backend.get_many(keys),
+                              iterations // 10),
+            'incr': timed(lambda i: backend.incr('counter'), iterations),
+        }
+        return '  '.join(f'{name}={rate:,.0f}'
+                         for name, rate in results.items())
+
+    def shared_hit_ratio(self, factory, processes, keys_count):
+        keys = [f'shared{i}' for i in range(keys_count)]
+        queue = multiprocessing.Queue()
+        total_hits = 0
+        # Воркеры стартуют по очереди, как после перезапуска gunicorn:
+        # с общим кэшем следующие находят то, что прогрел первый
+        for _ in range(processes):
+            worker = multiprocessing.Process(target=warm_worker,
+                                             args=(factory, keys, queue))
+            worker.start()
+            worker.join()
+            total_hits += queue.get()
+        return total_hits / (len(keys) * processes)
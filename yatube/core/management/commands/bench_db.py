@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import pragma_statements
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date REAL)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+    'CREATE INDEX post_author ON post (author_id, pub_date)',
+)
+FEED_QUERY = ('SELECT id, author_id, text FROM post '
+              'ORDER BY pub_date DESC LIMIT 10')
+PROFILE_QUERY = ('SELECT id, text FROM post WHERE author_id = ? '
+                 'ORDER BY pub_date DESC LIMIT 10')
+AUTHORS = 50
+
+
+def connect(path, statements, timeout):
+    connection = sqlite3.connect(path, timeout=timeout)
+    for statement in statements:
+        connection.execute(statement)
+    return connection
+
+
+def seed(path, rows):
+    connection = sqlite3.connect(path)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    now = time.time()
+    connection.executemany(
+        'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+        ((i % AUTHORS, 'x' * 200, now - i) for i in range(rows)))
+    connection.commit()
+    connection.close()
+
+
+def reader(path, statements, timeout, seconds, queue):
+    """Читает ленту и профили, как посетители сайта."""
+    connection = connect(path, statements, timeout)
+    reads = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            connection.execute(FEED_QUERY).fetchall()
+            connection.execute(PROFILE_QUERY,
+                               (reads % AUTHORS,)).fetchall()
+            reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    queue.put(('read', reads, errors, []))
+
+
+def writer(path, statements, timeout, seconds, queue):
+    """Публикует посты короткими транзакциями, как new_post."""
+    connection = connect(path, statements, timeout)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            with connection:
+                connection.execute(
+                    'INSERT INTO post (author_id, text, pub_date) '
+                    'VALUES (?, ?, ?)',
+                    (len(latencies) % AUTHORS, 'x' * 200, time.time()))
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+    queue.put(('write', len(latencies), errors, latencies))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLite с настройками по умолчанию и с прагмами '
+            'SQLITE_PRAGMAS при одновременных чтениях и записях')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--rows', type=int, default=20000)
+        # Без OPTIONS['timeout'] Django ждёт блокировку, как sqlite3, 5 с
+        parser.add_argument('--timeout', type=float, default=5)
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        modes = {
+            'default': ([], options['timeout']),
+            'tuned': (pragma_statements(),
+                      database.get('OPTIONS', {}).get('timeout', 5)),
+        }
+        self.stdout.write(
+            f'{options["readers"]} читателя, {options["writers"]} писателя, '
+            f'{options["seconds"]} с:')
+        for name, (statements, timeout) in modes.items():
+            directory = tempfile.mkdtemp()
+            try:
+                path = os.path.join(directory, 'bench.sqlite3')
+                seed(path, options['rows'])
+                result = self.run_mode(path, statements, timeout, options)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            self.stdout.write(f'  {name:<8} {result}')
+
+    def run_mode(self, path, statements, timeout, options):
+        # Режим журнала хранится в файле БД: ставим его до старта воркеров
+        connect(path, statements, timeout).close()
+        queue = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=target,
+                args=(path, statements, timeout, options['seconds'], queue))
+            for target, count in ((reader, options['readers']),
+                                  (writer, options['writers']))
+            for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        totals = {'read': 0, 'write': 0}
+        errors = 0
+        latencies = []
+        # Очередь читается до join: иначе воркер с большим результатом
+        # может не завершиться
+        for _ in workers:
+            kind, count, failed, times = queue.get()
+            totals[kind] += count
+            errors += failed
+            latencies.extend(times)
+        for worker in workers:
+            worker.join()
+        seconds = options['seconds']
+        return (f'reads/s={totals["read"] / seconds:,.0f}  '
+                f'writes/s={totals["write"] / seconds:,.0f}  '
+                f'write_p95_ms={percentile(latencies, 0.95) * 1000:.1f}  '
+                f'locked={errors}')
@@ -0,0 +1,149 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import urls as posts_urls
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# Адрес не из INTERNAL_IPS: иначе debug toolbar встроится в каждую страницу
+CLIENT_DEFAULTS = {'HTTP_HOST': 'localhost', 'REMOTE_ADDR': '10.0.0.1'}
+# Параметры запроса для адресов, которым без них нечего показать
+QUERY_STRINGS = {'search': 'q=кот'}
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def url_kwargs(post, group):
+    """Значения параметров маршрутов из данных в БД."""
+    return {
+        'username': post.author.username,
+        'post_id': post.pk,
+        'slug': group.slug if group else None,
+    }
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон всех именованных адресов posts/urls.py: '
+            'p50/p95/p99, запросы к БД на запрос и пропускная способность')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Запросов на каждый адрес')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Запросов для прогрева перед замером')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--only', nargs='*', default=None,
+                            help='Имена адресов (по умолчанию все)')
+
+    def handle(self, *args, **options):
+        post = (Post.objects.select_related('author')
+                .order_by('-pub_date', '-id').first())
+        if post is None:
+            raise CommandError('В БД нет постов: запустите seed_data')
+        group = Group.objects.order_by('pk').first()
+        kwargs = url_kwargs(post, group)
+
+        guest = Client(**CLIENT_DEFAULTS)
+        member = Client(**CLIENT_DEFAULTS)
+        member.force_login(post.author)
+
+        results = {}
+        for name, url in self.targets(kwargs, options['only']):
+            # Страницы для вошедших: иначе замерили бы только редирект
+            client = member if self.needs_login(guest, url) else guest
+            results[name] = self.measure(client, url, options)
+            self.report(name, results[name])
+
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                previous = json.load(file)['results']
+            self.compare(previous, results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'started': time.time(), 'kwargs': kwargs,
+                           'requests': options['requests'],
+                           'results': results}, file, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+    def targets(self, kwargs, only):
+        for pattern in posts_urls.urlpatterns:
+            name = pattern.name
+            if not name or (only and name not in only):
+                continue
+            params = pattern.pattern.converters.keys()
+            if any(kwargs.get(param) is None for param in params):
+                self.stdout.write(f'{name}: нет данных для адреса, пропущен')
+                continue
+            url = reverse(name, kwargs={param: kwargs[param]
+                                        for param in params})
+            if name in QUERY_STRINGS:
+                url = f'{url}?{QUERY_STRINGS[name]}'
+            yield name, url
+
+    def needs_login(self, client, url):
+        response = client.get(url)
+        return (response.status_code == 302
+                and '/auth/login/' in response.get('Location', ''))
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            client.get(url)
+        timings = []
+        queries = []
+        statuses = set()
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = client.get(url)
+                timings.append(
+                    (time.perf_counter() - request_started) * 1000)
+            queries.append(len(captured))
+            statuses.add(response.status_code)
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'queries': round(sum(queries) / len(queries), 1),
+            'rps': round(len(timings) / elapsed, 1),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<18} p50={result["p50_ms"]:>7.2f}мс '
+            f'p95={result["p95_ms"]:>7.2f}мс p99={result["p99_ms"]:>7.2f}мс '
+            f'запросов={result["queries"]:>5} rps={result["rps"]:>7} '
+            f'{result["status"]}')
+
+    def compare(self, previous, results):
+        self.stdout.write('Изменение p95 относительно прошлого прогона:')
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            before = previous[name]['p95_ms']
+            change = (result['p95_ms'] - before) / before if before else 0
+            self.stdout.write(
+                f'  {name:<18} {before:.2f} → {result["p95_ms"]:.2f}мс '
+                f'({change:+.0%}), запросов '
+                f'{previous[name]["queries"]} → {result["queries"]}')
@@ -0,0 +1,89 @@
+import glob
+import json
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ORDERINGS = {
+    'total': lambda group: group['total_ms'],
+    'count': lambda group: group['count'],
+    'max': lambda group: group['max_ms'],
+}
+
+
+def log_files(path):
+    """Журнал и его ротированные копии (path.1, path.2, ...)."""
+    return [path] + sorted(glob.glob(f'{glob.escape(path)}.[0-9]*'))
+
+
+def read_entries(paths):
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Строку могли дописывать в момент чтения
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def group_entries(entries):
+    """Агрегаты по отпечатку SQL."""
+    groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0,
+                                  'max_ms': 0.0, 'views': Counter(),
+                                  'places': Counter()})
+    for entry in entries:
+        group = groups[entry['fingerprint']]
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= group['max_ms']:
+            # Для примера — самый медленный запрос группы и его план
+            group['max_ms'] = entry['duration_ms']
+            group['sql'] = entry['sql']
+            group['plan'] = entry.get('plan') or []
+        group['views'][entry.get('view') or '-'] += 1
+        group['places'][entry.get('template') or entry.get('code')
+                        or '-'] += 1
+    return groups
+
+
+class Command(BaseCommand):
+    help = ('Самые тяжёлые запросы из журнала медленных запросов, '
+            'сгруппированные по отпечатку SQL')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None,
+                            help='Журнал (по умолчанию SLOW_QUERY_LOG)')
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--by', choices=sorted(ORDERINGS),
+                            default='total', help='Порядок групп')
+        parser.add_argument('--plans', action='store_true',
+                            help='Показать план самого медленного запроса')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.SLOW_QUERY_LOG
+        groups = group_entries(read_entries(log_files(path)))
+        if not groups:
+            raise CommandError(f'В {path} нет медленных запросов')
+        ranked = sorted(groups.items(), key=lambda item: ORDERINGS[
+            options['by']](item[1]), reverse=True)[:options['top']]
+        for fingerprint, group in ranked:
+            self.stdout.write(
+                f'{fingerprint}  {group["count"]} раз, всего '
+                f'{group["total_ms"]:.0f} мс, в среднем '
+                f'{group["total_ms"] / group["count"]:.1f} мс, максимум '
+                f'{group["max_ms"]:.1f} мс')
+            self.stdout.write('  маршруты: ' + ', '.join(
+                f'{view} ({count})'
+                for view, count in group['views'].most_common(3)))
+            self.stdout.write('  откуда: ' + ', '.join(
+                f'{place} ({count})'
+                for place, count in group['places'].most_common(3)))
+            self.stdout.write(f'  {group["sql"][:300]}')
+            if options['plans']:
+                for line in group['plan']:
+                    self.stdout.write(f'    {line}')
@@ -0,0 +1,295 @@
+"""Метрики запросов в формате Prometheus без внешних сервисов.
+
+Каждый процесс-воркер пишет счётчики в свой файл ``<pid>.db`` в
+``METRICS_DIR``, отображённый в память (mmap): запись — это сложение
+в уже размеченной ячейке, без блокировок между процессами. Страница
+метрик читает файлы всех процессов и складывает значения. Счётчики и
+гистограммы только растут, поэтому файлы завершившихся воркеров
+остаются и продолжают входить в сумму; при развёртывании каталог можно
+очистить.
+
+Формат файла: 8 байт — сколько байт занято, затем записи
+``[длина ключа: uint32][ключ][выравнивание до 8][значение: double]``.
+Ключ — JSON ``[имя серии, [[метка, значение], ...]]``. Новая серия
+дописывается в конец один раз; дальше её ячейки известны по индексу,
+и наблюдение не создаёт ни строк, ни словарей.
+"""
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FILE_SIZE = 1 << 20
+USED = struct.Struct('Q')
+KEY_LENGTH = struct.Struct('I')
+VALUE = struct.Struct('d')
+
+INF = float('inf')
+STATUS_CLASSES = tuple(f'{digit}xx' for digit in range(10))
+
+
+def _align(position):
+    return (position + 7) & ~7
+
+
+def _entries(buffer):
+    """Пары (ключ, смещение значения) из буфера файла процесса."""
+    used = USED.unpack_from(buffer, 0)[0]
+    position = USED.size
+    while position < used:
+        length = KEY_LENGTH.unpack_from(buffer, position)[0]
+        start = position + KEY_LENGTH.size
+        key = bytes(buffer[start:start + length]).decode()
+        offset = _align(start + length)
+        yield key, offset
+        position = offset + VALUE.size
+
+
+class ProcessFile:
+    """Файл значений одного процесса, отображённый в память."""
+
+    def __init__(self, path, size=FILE_SIZE):
+        with open(path, 'ab') as file:
+            if file.tell() < size:
+                file.truncate(size)
+        self._file = open(path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self.values = memoryview(self._mmap).cast('d')
+        # Процесс с тем же pid продолжает старый файл
+        self._offsets = dict(_entries(self._mmap))
+        self._used = max(USED.unpack_from(self._mmap, 0)[0], USED.size)
+        self._full = False
+
+    def slot(self, key):
+        """Индекс ячейки ключа в ``values``; None, если место кончилось."""
+        offset = self._offsets.get(key)
+        if offset is None:
+            encoded = key.encode()
+            start = self._used + KEY_LENGTH.size
+            offset = _align(start + len(encoded))
+            if offset + VALUE.size > len(self._mmap):
+                if not self._full:
+                    logger.warning('Файл метрик заполнен, новые серии '
+                                   'не записываются')
+                    self._full = True
+                return None
+            KEY_LENGTH.pack_into(self._mmap, self._used, len(encoded))
+            self._mmap[start:start + len(encoded)] = encoded
+            # Читатели видят запись только после того, как она готова
+            self._used = offset + VALUE.size
+            USED.pack_into(self._mmap, 0, self._used)
+            self._offsets[key] = offset
+        return offset // VALUE.size
+
+
+class Registry:
+    """Ячейки серий текущего процесса.
+
+    Файл открывается при первом наблюдении и заново после fork, когда
+    у процесса сменился pid.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owner = None
+        self._file = None
+        self._slots = {}
+
+    def _process_file(self):
+        owner = (os.getpid(), settings.METRICS_DIR)
+        if self._owner != owner:
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            self._file = ProcessFile(
+                os.path.join(settings.METRICS_DIR, f'{owner[0]}.db'))
+            self._owner = owner
+            self._slots = {}
+        return self._file
+
+    def _slots_of(self, metric, labels):
+        file = self._process_file()
+        slots = self._slots.get((metric, labels))
+        if slots is None:
+            slots = self._slots[metric, labels] = [
+                file.slot(key) for key in metric.keys(labels)]
+        return file.values, slots
+
+    def add(self, metric, labels, index, amount):
+        """Прибавляет ``amount`` к ``index``-й ячейке серии."""
+        with self._lock:
+            values, slots = self._slots_of(metric, labels)
+            if slots[index] is not None:
+                values[slots[index]] += amount
+
+    def observe(self, metric, labels, bucket, value):
+        """Наблюдение гистограммы: корзина, сумма и количество разом."""
+        with self._lock:
+            values, slots = self._slots_of(metric, labels)
+            if None not in slots:
+                values[slots[bucket]] += 1
+                values[slots[-2]] += value
+                values[slots[-1]] += 1
+
+
+registry = Registry()
+
+
+def _key(name, labels):
+    return json.dumps([name, [list(pair) for pair in labels]])
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def keys(self, labels):
+        return [_key(self.name, zip(self.labelnames, labels))]
+
+    def inc(self, labels, amount=1):
+        registry.add(self, labels, 0, amount)
+
+
+class Histogram(Counter):
+    """Гистограмма с фиксированными границами корзин.
+
+    В файле хранятся число наблюдений в каждой корзине (не накопленное),
+    сумма и количество; накопленные ``_bucket`` считаются при выдаче.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (INF,)
+
+    def keys(self, labels):
+        pairs = list(zip(self.labelnames, labels))
+        return ([_key(f'{self.name}_bucket',
+                      pairs + [('le', _format(bound))])
+                 for bound in self.buckets]
+                + [_key(f'{self.name}_sum', pairs),
+                   _key(f'{self.name}_count', pairs)])
+
+    def observe(self, labels, value):
+        registry.observe(self, labels, bisect_left(self.buckets, value),
+                         value)
+
+
+def _format(value):
+    if value == INF:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REQUESTS = Counter(
+    'yatube_http_requests_total',
+    'Запросы по имени маршрута и классу статуса ответа.',
+    ('view', 'status'))
+LATENCY = Histogram(
+    'yatube_http_request_duration_seconds',
+    'Время обработки запроса.', ('view',),
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+QUERIES = Histogram(
+    'yatube_http_request_queries',
+    'Запросов к БД на запрос.', ('view',),
+    (0, 1, 2, 3, 5, 10, 20, 50, 100))
+RESPONSE_SIZE = Histogram(
+    'yatube_http_response_size_bytes',
+    'Размер тела ответа (без потоковых ответов).', ('view',),
+    (1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
+METRICS = (REQUESTS, LATENCY, QUERIES, RESPONSE_SIZE)
+
+
+def observe_request(view, response, duration, queries):
+    """Учитывает один обработанный запрос."""
+    labels = (view,)
+    REQUESTS.inc((view, STATUS_CLASSES[response.status_code // 100]))
+    LATENCY.observe(labels, duration)
+    QUERIES.observe(labels, queries)
+    if not response.streaming:
+        size = response.get('Content-Length')
+        RESPONSE_SIZE.observe(
+            labels, int(size) if size else len(response.content))
+
+
+def read_totals(directory):
+    """Суммы значений по ключам из файлов всех процессов."""
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            continue
+        if len(data) < USED.size:
+            continue
+        for key, offset in _entries(data):
+            totals[key] += VALUE.unpack_from(data, offset)[0]
+    return totals
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _series(name, labels, value):
+    if labels:
+        text = ','.join(f'{label}="{_escape(label_value)}"'
+                        for label, label_value in labels)
+        name = f'{name}{{{text}}}'
+    return f'{name} {_format(value)}'
+
+
+def _histogram_lines(metric, series):
+    groups = defaultdict(dict)
+    for (name, labels), value in series.items():
+        if name == f'{metric.name}_bucket':
+            bound = labels[-1][1]
+            groups[labels[:-1]][float(bound)] = value
+    lines = []
+    for labels in sorted(groups):
+        cumulative = 0
+        for bound in sorted(groups[labels]):
+            cumulative += groups[labels][bound]
+            lines.append(_series(f'{metric.name}_bucket',
+                                 labels + (('le', _format(bound)),),
+                                 cumulative))
+        for suffix in ('_sum', '_count'):
+            lines.append(_series(f'{metric.name}{suffix}', labels,
+                                 series.get((metric.name + suffix, labels),
+                                            0)))
+    return lines
+
+
+def exposition(directory=None):
+    """Текст метрик всех процессов в формате Prometheus 0.0.4."""
+    totals = read_totals(directory or settings.METRICS_DIR)
+    series = {}
+    for key, value in totals.items():
+        name, labels = json.loads(key)
+        series[name, tuple(tuple(pair) for pair in labels)] = value
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        if metric.kind == 'histogram':
+            lines.extend(_histogram_lines(metric, series))
+        else:
+            lines.extend(_series(name, labels, value)
+                         for (name, labels), value in sorted(series.items())
+                         if name == metric.name)
+    return '\n'.join(lines) + '\n'
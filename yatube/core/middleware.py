@@ -0,0 +1,77 @@
+from time import perf_counter
+
+from django.conf import settings
+
+from . import metrics, profiling, routers, sampling
+
+
+class ProfilingMiddleware:
+    """Время запроса, БД, шаблонов и кэша в заголовок Server-Timing.
+
+    Те же замеры идут в метрики Prometheus (см. ``core/metrics.py``).
+    Стоит первым в MIDDLEWARE, чтобы учесть и остальные middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profiling.profile(request) as recorder:
+            response = self.get_response(request)
+        total = perf_counter() - recorder.started
+        response['Server-Timing'] = recorder.server_timing(total)
+        route = profiling.route_name(request)
+        profiling.stats.add(route, recorder, total)
+        metrics.observe_request(route, response, total, recorder.db_count)
+        return response
+
+
+class SamplingProfilerMiddleware:
+    """Профиль запроса по ``?profile=1`` сотрудника или по выборке.
+
+    Стоит после AuthenticationMiddleware: нужен ``request.user``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sampling.should_profile(request):
+            return self.get_response(request)
+        return sampling.profile_request(request, self.get_response)
+
+
+class ReplicaMiddleware:
+    """Ленты читаются с реплик, если пользователь недавно ничего не писал.
+
+    См. ``core/routers.py``.
+    """
+    SAFE_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._replica_token = None
+        writes_token = routers.track_writes()
+        try:
+            response = self.get_response(request)
+            wrote = routers.wrote_to_primary()
+        finally:
+            routers.stop_tracking(writes_token)
+            if request._replica_token is not None:
+                routers.reset(request._replica_token)
+        # Подписка и отписка — GET-ссылки, но тоже пишут
+        if wrote or request.method not in self.SAFE_METHODS:
+            response.set_cookie(routers.STICKY_COOKIE, '1',
+                                max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS
+                and request.method in self.SAFE_METHODS
+                and routers.STICKY_COOKIE not in request.COOKIES
+                and request.resolver_match.view_name
+                in settings.REPLICA_VIEWS):
+            request._replica_token = routers.read_from_replicas()
@@ -0,0 +1,35 @@
+import json
+
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Профиль одного запроса, снятый по требованию (см. sampling.py)."""
+    created = models.DateTimeField('Дата', auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField('Адрес', max_length=2000)
+    view_name = models.CharField('Маршрут', max_length=200, blank=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.SET_NULL,
+                             null=True, blank=True, related_name='+',
+                             verbose_name='Пользователь')
+    status_code = models.PositiveSmallIntegerField('Статус')
+    duration = models.FloatField('Время, с')
+    samples = models.PositiveIntegerField('Сэмплов')
+    # Свёрнутые стеки: «модуль.функция;модуль.функция число»
+    stacks = models.TextField('Стеки', blank=True)
+    # JSON: [{"sql": ..., "duration": ...}, ...]
+    queries = models.TextField('Запросы к БД', blank=True)
+
+    class Meta:
+        ordering = ('-created',)
+        indexes = [models.Index(fields=['-created'],
+                                name='profile_created_idx')]
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
+
+    @property
+    def query_list(self):
+        return json.loads(self.queries or '[]')
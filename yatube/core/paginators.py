@@ -0,0 +1,47 @@
+"""Паджинатор для списков админки по большим таблицам.
+
+Список изменений в админке на каждой странице выполняет ``COUNT(*)``,
+а на таблице в миллионы строк это полный проход по индексу. Здесь точное
+число заменяется оценкой:
+
+* без фильтров — число строк из статистики SQLite (``sqlite_stat1``,
+  её собирает ``ANALYZE`` или ``PRAGMA optimize``);
+* с фильтрами или без статистики — счёт не дальше
+  ``ADMIN_EXACT_COUNT_LIMIT`` строк: ``COUNT(*)`` по подзапросу с LIMIT.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+def table_estimate(model, using='default'):
+    """Число строк таблицы по статистике планировщика или None."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s '
+                           'LIMIT 1', [model._meta.db_table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # Таблицы sqlite_stat1 нет, пока не было ANALYZE
+        return None
+    if row is None:
+        return None
+    return int(row[0].split()[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator с оценкой вместо точного ``COUNT(*)``."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        if not queryset.query.where:
+            estimate = table_estimate(queryset.model, queryset.db)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset.order_by()[:limit].count()
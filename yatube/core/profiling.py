@@ -0,0 +1,238 @@
+"""Лёгкое профилирование каждого запроса в production.
+
+Для запроса считаются общее время, число и время запросов к БД, время
+отрисовки шаблонов, попадания и промахи кэша. Итог уходит в заголовок
+``Server-Timing`` (его показывают инструменты разработчика браузера)
+и в агрегаты по имени маршрута, которые сотрудники видят на странице
+``core:profiling``.
+
+В отличие от debug toolbar здесь нет ни стеков, ни текста запросов:
+на запрос приходится несколько вызовов ``perf_counter`` и сложений,
+это единицы микросекунд. Запросы к БД считает ``execute_wrapper``,
+шаблоны и кэш — обёртки методов, которые ``install()`` ставит один раз
+при старте; вне профилируемого запроса обёртки сразу передают вызов
+дальше.
+
+Медленные запросы пишет в журнал отдельная обёртка ``log_slow``: её
+ставит каждому соединению ``watch_connection`` (приёмник
+``connection_created``), поэтому в журнал попадают и фоновые потоки,
+и management-команды. Профилируемый запрос только добавляет к записи
+свой маршрут.
+"""
+import threading
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+from . import slow_queries
+
+_current = ContextVar('profiling_recorder', default=None)
+# Пока выполняется EXPLAIN медленного запроса, его запросы не считаются
+_explaining = ContextVar('profiling_explaining', default=False)
+_missing = object()
+
+
+class Recorder:
+    """Счётчики одного запроса; времена — в секундах."""
+    __slots__ = ('request', 'started', 'db_count', 'db_time',
+                 'template_time', 'template_depth', 'cache_time',
+                 'cache_hits', 'cache_misses')
+
+    def __init__(self, request=None):
+        self.request = request
+        self.started = perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def server_timing(self, total):
+        return (f'total;dur={total * 1000:.1f}, '
+                f'db;dur={self.db_time * 1000:.1f};'
+                f'desc="{self.db_count} queries", '
+                f'tpl;dur={self.template_time * 1000:.1f}, '
+                f'cache;dur={self.cache_time * 1000:.1f};'
+                f'desc="{self.cache_hits} hits {self.cache_misses} misses"')
+
+
+class RouteStats:
+    """Агрегаты по именам маршрутов в памяти процесса."""
+    FIELDS = ('requests', 'total_time', 'max_time', 'db_count', 'db_time',
+              'template_time', 'cache_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def add(self, route, recorder, total):
+        with self._lock:
+            row = self._routes.get(route)
+            if row is None:
+                row = self._routes[route] = dict.fromkeys(self.FIELDS, 0)
+            row['requests'] += 1
+            row['total_time'] += total
+            row['max_time'] = max(row['max_time'], total)
+            row['db_count'] += recorder.db_count
+            row['db_time'] += recorder.db_time
+            row['template_time'] += recorder.template_time
+            row['cache_time'] += recorder.cache_time
+            row['cache_hits'] += recorder.cache_hits
+            row['cache_misses'] += recorder.cache_misses
+
+    def snapshot(self):
+        with self._lock:
+            return {route: dict(row) for route, row in self._routes.items()}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+stats = RouteStats()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _current.get()
+    if recorder is None or _explaining.get():
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.db_time += perf_counter() - started
+        recorder.db_count += 1
+
+
+def log_slow(execute, sql, params, many, context):
+    """Пишет в журнал запросы дольше ``SLOW_QUERY_THRESHOLD``."""
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold is None or _explaining.get():
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    result = execute(sql, params, many, context)
+    duration = perf_counter() - started
+    if duration >= threshold:
+        recorder = _current.get()
+        request = recorder.request if recorder is not None else None
+        token = _explaining.set(True)
+        try:
+            slow_queries.record(
+                sql, params, many, context, duration,
+                view=route_name(request) if request is not None else None,
+                path=request.path if request is not None else None)
+        finally:
+            _explaining.reset(token)
+    return result
+
+
+def watch_connection(sender, connection, **kwargs):
+    """Приёмник connection_created: ставит соединению ``log_slow``."""
+    # В начало списка: execute_wrapper() снимает последнюю обёртку, и
+    # соединение, открытое внутри profile(), не должно потерять эту
+    if log_slow not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow)
+
+
+@contextmanager
+def profile(request=None):
+    """Профилирует код внутри блока: ``with profile() as recorder``.
+
+    Записи журнала медленных запросов (см. ``slow_queries.py``) из блока
+    получают маршрут и адрес ``request``.
+    """
+    recorder = Recorder(request)
+    token = _current.set(recorder)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(_record_query))
+            yield recorder
+    finally:
+        _current.reset(token)
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        recorder = _current.get()
+        # Виджеты форм отрисовываются такими же шаблонами внутри страницы
+        if recorder is None or recorder.template_depth:
+            return render(self, *args, **kwargs)
+        started = perf_counter()
+        recorder.template_depth += 1
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            recorder.template_depth -= 1
+            recorder.template_time += perf_counter() - started
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        recorder = _current.get()
+        if recorder is None:
+            return get(self, key, default, version)
+        started = perf_counter()
+        value = get(self, key, _missing, version)
+        recorder.cache_time += perf_counter() - started
+        if value is _missing:
+            recorder.cache_misses += 1
+            return default
+        recorder.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        recorder = _current.get()
+        if recorder is None:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        started = perf_counter()
+        found = get_many(self, keys, version)
+        recorder.cache_time += perf_counter() - started
+        recorder.cache_hits += len(found)
+        recorder.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install():
+    """Ставит обёртки шаблонов и кэшей; повторный вызов ничего не делает.
+
+    Отрисовка считается по шаблонам бэкенда Django (``render()``,
+    ``TemplateResponse``) только на верхнем уровне: вложенные шаблоны
+    не учитываются дважды.
+    """
+    if getattr(Template.render, 'profiled', False):
+        return
+    Template.render = _timed_render(Template.render)
+    Template.render.profiled = True
+    for config in settings.CACHES.values():
+        backend = import_string(config['BACKEND'])
+        if getattr(backend.get, 'profiled', False):
+            continue
+        backend.get = _counted_get(backend.get)
+        backend.get_many = _counted_get_many(backend.get_many)
+        backend.get.profiled = True
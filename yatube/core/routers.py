@@ -0,0 +1,77 @@
+"""Чтение лент с реплик, запись — в основную БД.
+
+Ленты (``REPLICA_VIEWS``) читаются чаще всего и терпят небольшое
+отставание, поэтому их запросы на чтение уходят на одну из реплик
+``DATABASE_REPLICAS``. Всё остальное, включая любые записи, идёт в
+``default``.
+
+Решение принимает ``ReplicaMiddleware``: для GET-запроса к ленте оно
+включает чтение с реплик на время обработки (переменная контекста,
+своя у каждого потока). После POST пользователь получает на
+``REPLICA_STICKY_SECONDS`` cookie, и пока она жива, его ленты читаются
+из основной БД: свой новый пост или комментарий он увидит сразу, даже
+если реплика ещё не догнала. Cookie ставится после любого запроса,
+который писал в основную БД, — в том числе после GET-ссылок подписки.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+STICKY_COOKIE = 'db_primary'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+# Алиасы, в которые писал текущий запрос; None — запись не отслеживается
+_writes = ContextVar('database_writes', default=None)
+
+
+def read_from_replicas():
+    """Включает чтение с реплик; вернуть как было — ``reset(token)``."""
+    return _replica_reads.set(True)
+
+
+def reset(token):
+    _replica_reads.reset(token)
+
+
+def track_writes():
+    """Начинает учёт записей запроса; закончить — ``stop_tracking(token)``."""
+    return _writes.set(set())
+
+
+def stop_tracking(token):
+    _writes.reset(token)
+
+
+def note_write(alias='default'):
+    """Отмечает, что текущий запрос пишет в ``alias``."""
+    writes = _writes.get()
+    if writes is not None:
+        writes.add(alias)
+
+
+def wrote_to_primary():
+    writes = _writes.get()
+    return bool(writes) and 'default' in writes
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        note_write('default')
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной БД: связи между ними допустимы
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с данными из основной БД
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,127 @@
+"""Сэмплирующий профайлер одного запроса по требованию.
+
+Пока запрос выполняется, фоновый поток каждые ``PROFILER_INTERVAL``
+секунд снимает стек потока запроса (``sys._current_frames``) и считает
+одинаковые стеки. Результат — «свёрнутые» стеки
+(``модуль.функция;модуль.функция N``), которые принимают flamegraph.pl
+и speedscope. Заодно записываются запросы к БД с их временем.
+
+Профилирование включается только для отдельного запроса: сотрудник
+добавляет ``?profile=1`` или запрос попадает в долю
+``PROFILER_SAMPLE_RATE``. Для остальных запросов middleware лишь
+проверяет эти условия, поток не создаётся.
+"""
+import json
+import random
+import sys
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from .profiling import route_name
+
+QUERY_FLAG = 'profile'
+# Длинные запросы в профиле не нужны целиком
+MAX_SQL_LENGTH = 2000
+
+
+def _frame_name(frame):
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}.{frame.f_code.co_name}'
+
+
+def folded_stack(frame):
+    """Стек от корня к вершине в формате свёрнутых стеков."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Поток, снимающий стек потока ``thread_id`` через равные интервалы."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[folded_stack(frame)] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def folded(self):
+        return '\n'.join(f'{stack} {count}'
+                         for stack, count in self.stacks.most_common())
+
+
+class QueryLog:
+    """execute_wrapper: SQL запроса, его БД и время выполнения."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql[:MAX_SQL_LENGTH],
+                'database': context['connection'].alias,
+                'duration': perf_counter() - started,
+            })
+
+
+def should_profile(request):
+    """Профилировать ли запрос: флаг сотрудника или случайная выборка."""
+    if QUERY_FLAG in request.GET and request.user.is_staff:
+        return True
+    rate = settings.PROFILER_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def profile_request(request, get_response):
+    """Выполняет запрос под профайлером и сохраняет RequestProfile."""
+    from .models import RequestProfile
+
+    sampler = Sampler(threading.get_ident(), settings.PROFILER_INTERVAL)
+    log = QueryLog()
+    started = perf_counter()
+    sampler.start()
+    try:
+        # Ленты читаются с реплик (см. core/routers.py): слушаем все БД
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            response = get_response(request)
+    finally:
+        sampler.stop()
+    duration = perf_counter() - started
+    user = request.user if request.user.is_authenticated else None
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        view_name=route_name(request)[:200],
+        user=user,
+        status_code=response.status_code,
+        duration=duration,
+        samples=sum(sampler.stacks.values()),
+        stacks=sampler.folded(),
+        queries=json.dumps(log.queries, ensure_ascii=False),
+    )
+    response['X-Profile-Id'] = str(profile.pk)
+    return response
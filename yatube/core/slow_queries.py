@@ -0,0 +1,153 @@
+"""Журнал медленных запросов к БД.
+
+Запрос дольше ``SLOW_QUERY_THRESHOLD`` секунд попадает в логгер
+``core.slow_queries`` одной строкой JSON (NDJSON). В настройках логгер
+пишет в файл с ротацией ``SLOW_QUERY_LOG``. В записи:
+
+* маршрут и адрес запроса, в котором выполнялся SQL;
+* место в коде проекта и, если запрос выполнился при отрисовке,
+  шаблон и строка в нём;
+* параметры, где значения чувствительных столбцов (пароли, сессии,
+  почта, токены) заменены на ``***``;
+* план запроса (``EXPLAIN``) в момент выполнения;
+* отпечаток — хэш SQL без литералов и с любым числом элементов
+  ``IN (...)``: по нему команда ``slow_queries`` группирует записи.
+
+Время запросов измеряет обёртка ``profiling.log_slow``, которая стоит на
+каждом соединении: запросы фоновых потоков и management-команд тоже
+попадают в журнал, только без маршрута. Сюда приходят лишь медленные
+запросы, поэтому разбор стека и ``EXPLAIN`` остальных не касаются.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REDACTED = '***'
+SENSITIVE = re.compile(r'password|passwd|secret|token|session_key|'
+                       r'session_data|email|api_key', re.IGNORECASE)
+# Сколько текста перед %s смотреть в поисках имени столбца
+LOOKBEHIND = 80
+MAX_PARAM_LENGTH = 200
+INSERT_COLUMNS = re.compile(r'^\s*INSERT\s+INTO\s+\S+\s*\(([^)]*)\)',
+                            re.IGNORECASE)
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+SPACES = re.compile(r'\s+')
+
+# Собственные модули, которые не считаются «местом запроса»
+_SKIP_FILES = tuple(os.path.join(settings.BASE_DIR, 'core', name)
+                    for name in ('profiling.py', 'slow_queries.py'))
+
+
+def fingerprint(sql):
+    """Хэш нормализованного SQL: одинаковый для запросов одной формы."""
+    normalized = STRING_LITERAL.sub('?', sql)
+    normalized = NUMBER.sub('?', normalized)
+    normalized = IN_LIST.sub('(...)', normalized)
+    normalized = SPACES.sub(' ', normalized).strip().lower()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _shown(value):
+    if isinstance(value, (bytes, memoryview)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, str) and len(value) > MAX_PARAM_LENGTH:
+        return value[:MAX_PARAM_LENGTH] + '…'
+    if isinstance(value, (int, float, bool, str)) or value is None:
+        return value
+    return str(value)
+
+
+def redact(sql, params):
+    """Параметры для журнала без значений чувствительных столбцов."""
+    if not params:
+        return params
+    if isinstance(params, dict):
+        return {name: REDACTED if SENSITIVE.search(name) else _shown(value)
+                for name, value in params.items()}
+    insert = INSERT_COLUMNS.match(sql)
+    if insert:
+        columns = insert.group(1).split(',')
+        return [REDACTED if SENSITIVE.search(columns[i % len(columns)])
+                else _shown(value) for i, value in enumerate(params)]
+    result = []
+    position = 0
+    for value in params:
+        position = sql.find('%s', position)
+        before = sql[max(position - LOOKBEHIND, 0):position]
+        # Ближайший столбец перед плейсхолдером — после последней запятой
+        # или скобки, чтобы не задеть соседние условия
+        column = re.split(r'[,(]|\bAND\b|\bOR\b', before)[-1]
+        result.append(REDACTED if position >= 0 and SENSITIVE.search(column)
+                      else _shown(value))
+        position += 2
+    return result
+
+
+def _locate(frame):
+    """Место в коде проекта и в шаблоне, откуда выполнился запрос."""
+    code = template = None
+    while frame is not None and not (code and template):
+        filename = frame.f_code.co_filename
+        if (template is None and frame.f_code.co_name == 'render_annotated'
+                and 'self' in frame.f_locals):
+            node = frame.f_locals['self']
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name}:{token.lineno}'
+        if (code is None and filename.startswith(settings.BASE_DIR)
+                and not filename.startswith(_SKIP_FILES)):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            code = f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return code, template
+
+
+def explain(connection, sql, params):
+    """План запроса в виде строк; пустой список, если не получилось."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return []
+    try:
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' '.join(str(column) for column in row)
+                    for row in cursor.fetchall()]
+    except (DatabaseError, NotImplementedError):
+        return []
+
+
+def record(sql, params, many, context, duration, view=None, path=None):
+    """Пишет медленный запрос в журнал.
+
+    Вызывающий отвечает за то, чтобы запросы ``EXPLAIN`` не попали в
+    журнал сами (см. ``profiling.log_slow``).
+    """
+    code, template = _locate(sys._getframe(1))
+    plan = [] if many else explain(context['connection'], sql, params)
+    entry = {
+        'time': timezone.now().isoformat(),
+        'duration_ms': round(duration * 1000, 2),
+        'fingerprint': fingerprint(sql),
+        'sql': sql,
+        'params': None if many else redact(sql, params),
+        'many': many,
+        'view': view,
+        'path': path,
+        'code': code,
+        'template': template,
+        'plan': plan,
+    }
+    logger.warning(json.dumps(entry, ensure_ascii=False, default=str))
@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def increment_many(path, times):
+    backend = SQLiteCache(path, {})
+    for _ in range(times):
+        backend.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_set_get_and_expiry(self):
+        """Значения сохраняются, истёкшие не возвращаются"""
+        self.cache.set('list', [1, 'два'])
+        self.cache.set('short', 'value', timeout=0.05)
+        self.assertEqual(self.cache.get('list'), [1, 'два'])
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'new'))
+        self.assertFalse(self.cache.add('short', 'newer'))
+        self.assertEqual(self.cache.get('short'), 'new')
+
+    def test_data_is_shared_between_instances(self):
+        """Другой экземпляр (процесс) видит те же данные"""
+        self.cache.set_many({'a': 1, 'b': True, 'c': None})
+        other = self.make_cache()
+        self.assertEqual(other.get_many(['a', 'b', 'c', 'd']),
+                         {'a': 1, 'b': True, 'c': None})
+        other.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': None})
+
+    def test_incr_is_atomic_across_processes(self):
+        """Параллельные incr из разных процессов не теряют обновлений"""
+        self.cache.set('counter', 0)
+        workers = [
+            multiprocessing.Process(target=increment_many,
+                                    args=(self.path, 100))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 400)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_read_keys_are_evicted(self):
+        """При переполнении вытесняются давно не читавшиеся ключи"""
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_EVERY=1,
+                                CULL_FREQUENCY=5, TOUCH_INTERVAL=0)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+            time.sleep(0.001)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+    def test_tests_use_their_own_cache_file(self):
+        """Тесты не открывают и не очищают кэш сервера разработчика"""
+        location = settings.CACHES['default']['LOCATION']
+        self.assertTrue(location.startswith(settings.TEST_FILES_DIR))
+        self.assertNotEqual(os.path.dirname(location), settings.BASE_DIR)
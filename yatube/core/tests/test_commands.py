@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.management.commands.seed_data import new_ids
+from posts.models import Comment, FeedEntry, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class SeedAndBenchTests(TestCase):
+    def test_seed_data_builds_consistent_dataset(self):
+        """seed_data создаёт данные вместе со счётчиками и лентами"""
+        call_command('seed_data', users=30, groups=3, posts=200,
+                     comments=100, follows_per_user=3, batch_size=50,
+                     stdout=StringIO())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        # Даты распределены, а не одинаковые «сейчас»
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 100)
+        top = UserStats.objects.order_by('-posts_count').first()
+        self.assertEqual(top.posts_count,
+                         Post.objects.filter(author=top.user).count())
+        follow = Follow.objects.first()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=follow.user_id,
+                                     author=follow.author_id).count(),
+            Post.objects.filter(author=follow.author_id).count())
+
+    def test_seed_data_invalidates_cached_pages(self):
+        """После заполнения главная не отдаёт 304 по старому ETag"""
+        client = Client()
+        response = client.get(reverse('index'))
+        call_command('seed_data', users=5, groups=1, posts=20, comments=5,
+                     follows_per_user=1, stdout=StringIO())
+        response = client.get(reverse('index'),
+                              HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page'].paginator.count, 20)
+
+    def test_new_ids_with_gaps_are_packed(self):
+        """Id с пропусками отдаются компактным массивом"""
+        users = [User.objects.create_user(f'user-{i}') for i in range(3)]
+        users[1].delete()
+        ids = new_ids(User, 0)
+        self.assertEqual(list(ids), [users[0].pk, users[2].pk])
+        self.assertNotIsInstance(ids, list)
+
+    def test_bench_http_reports_every_named_url(self):
+        """bench_http замеряет все адреса posts/urls.py и пишет JSON"""
+        call_command('seed_data', users=5, groups=1, posts=20, comments=5,
+                     follows_per_user=1, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('bench_http', requests=2, warmup=0, output=output,
+                         stdout=StringIO())
+            with open(output) as file:
+                results = json.load(file)['results']
+        self.assertIn('index', results)
+        self.assertIn('post_view', results)
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertLess(max(result['status']), 400)
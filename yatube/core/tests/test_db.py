@@ -0,0 +1,30 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+
+class SQLiteTuningTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connections_get_pragmas(self):
+        """Каждое соединение получает прагмы из SQLITE_PRAGMAS"""
+        # 1 — NORMAL; journal_mode у тестовой БД в памяти всегда memory
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    def test_bench_db_compares_both_modes(self):
+        """bench_db сравнивает режим по умолчанию и настроенный"""
+        out = StringIO()
+        call_command('bench_db', seconds=0.3, readers=1, writers=1,
+                     rows=100, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[1].lstrip().startswith('default'))
+        self.assertTrue(lines[2].lstrip().startswith('tuned'))
+        for line in lines[1:]:
+            self.assertIn('writes/s=', line)
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Post, UserStats
+
+from core import group_commit
+from core.routers import STICKY_COOKIE
+
+User = get_user_model()
+
+
+# Писатель работает в своём потоке: данные теста должны быть закоммичены
+@override_settings(GROUP_COMMIT=True, GROUP_COMMIT_WINDOW=0.05)
+class GroupCommitTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('Author')
+        self.reader = User.objects.create_user('Reader')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_views_write_through_writer(self):
+        """Комментарий и подписка записываются потоком-писателем"""
+        writes = group_commit.writer.writes
+        self.client.post(
+            reverse('add_comment', args=['Author', self.post.pk]),
+            {'text': 'Комментарий'})
+        response = self.client.get(reverse('profile_follow',
+                                           args=['Author']))
+        # Запись ушла в другой поток, но запрос всё равно считается пишущим
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(group_commit.writer.writes, writes + 2)
+        # Запрос вернулся после коммита: строки и сигналы уже видны
+        self.assertTrue(Comment.objects.filter(text='Комментарий').exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.client.get(reverse('profile_unfollow', args=['Author']))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_operations_share_one_transaction(self):
+        """Операции из очереди коммитятся пачкой, а не по одной"""
+        batches = group_commit.writer.batches
+        futures = [group_commit.writer.submit(
+            Comment.objects.create, post=self.post, author=self.reader,
+            text=f'Комментарий {i}') for i in range(20)]
+        for future in futures:
+            future.result(5)
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertLess(group_commit.writer.batches - batches, 5)
+
+    def test_failed_operation_does_not_roll_back_batch(self):
+        """Ошибка одной операции достаётся только её запросу"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        duplicate = group_commit.writer.submit(
+            Follow.objects.create, user=self.reader, author=self.author)
+        comment = group_commit.writer.submit(
+            Comment.objects.create, post=self.post, author=self.reader,
+            text='Комментарий')
+        with self.assertRaises(IntegrityError):
+            duplicate.result(5)
+        self.assertIsNotNone(comment.result(5).pk)
+        self.assertTrue(Comment.objects.exists())
+
+    @override_settings(GROUP_COMMIT=False)
+    def test_disabled_runs_in_place(self):
+        """Без GROUP_COMMIT запись выполняется в потоке запроса"""
+        writes = group_commit.writer.writes
+        comment = group_commit.run(Comment.objects.create, post=self.post,
+                                   author=self.reader, text='Сразу')
+        self.assertIsNotNone(comment.pk)
+        self.assertEqual(group_commit.writer.writes, writes)
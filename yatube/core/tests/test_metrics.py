@@ -0,0 +1,106 @@
+import os
+import re
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+SAMPLE = re.compile(r'^[a-z_]+(\{[^}]*\})? [0-9.e+-]+$')
+
+
+class MetricsLocationTests(SimpleTestCase):
+    def test_files_are_kept_outside_source_tree(self):
+        """Файлы метрик воркеров не попадают в дерево исходников"""
+        self.assertFalse(settings.METRICS_DIR.startswith(settings.BASE_DIR))
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user('Staff', is_staff=True)
+        Post.objects.create(text='Пост', author=cls.staff)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        overridden = override_settings(METRICS_DIR=self.directory)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+    def test_values_of_all_processes_are_summed(self):
+        """Значения из файлов разных процессов складываются"""
+        for pid, amount in ((101, 2), (102, 3)):
+            process = metrics.ProcessFile(
+                os.path.join(self.directory, f'{pid}.db'))
+            for key in metrics.REQUESTS.keys(('index', '2xx')):
+                process.values[process.slot(key)] += amount
+        text = metrics.exposition()
+        self.assertIn(
+            'yatube_http_requests_total{view="index",status="2xx"} 5', text)
+
+    def test_restarted_process_continues_its_file(self):
+        """Процесс с тем же pid дописывает, а не затирает свой файл"""
+        path = os.path.join(self.directory, '7.db')
+        key = metrics.REQUESTS.keys(('index', '2xx'))[0]
+        first = metrics.ProcessFile(path)
+        first.values[first.slot(key)] += 4
+        second = metrics.ProcessFile(path)
+        self.assertEqual(second.values[second.slot(key)], 4)
+
+    def test_requests_are_recorded_as_histograms(self):
+        """Запросы попадают в счётчик и гистограммы по имени маршрута"""
+        client = Client()
+        for _ in range(3):
+            client.get(reverse('index'))
+        text = metrics.exposition()
+        self.assertIn(
+            'yatube_http_requests_total{view="index",status="2xx"} 3', text)
+        for name in ('yatube_http_request_duration_seconds',
+                     'yatube_http_request_queries',
+                     'yatube_http_response_size_bytes'):
+            with self.subTest(metric=name):
+                self.assertIn(f'# TYPE {name} histogram', text)
+                self.assertIn(f'{name}_bucket{{view="index",le="+Inf"}} 3',
+                              text)
+                self.assertIn(f'{name}_count{{view="index"}} 3', text)
+                buckets = [float(line.rsplit(' ', 1)[1])
+                           for line in text.splitlines()
+                           if line.startswith(f'{name}_bucket{{view="index"')]
+                self.assertEqual(buckets, sorted(buckets))
+        for line in text.splitlines():
+            if not line.startswith('#'):
+                self.assertRegex(line, SAMPLE)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_is_for_collector_and_staff(self):
+        """Метрики отдаются по токену, разрешённым адресам и сотрудникам"""
+        url = reverse('core:metrics')
+        # Запросы через прокси приходят с 127.0.0.1: адрес сам не пускает
+        self.assertEqual(Client().get(url).status_code, 403)
+        self.assertEqual(Client().get(
+            url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = Client().get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.2']):
+            self.assertEqual(
+                Client(REMOTE_ADDR='10.0.0.2').get(url).status_code, 200)
+        staff = Client(REMOTE_ADDR='10.0.0.1')
+        staff.force_login(MetricsTests.staff)
+        self.assertEqual(staff.get(url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_is_not_accepted(self):
+        """Без настроенного токена пустой Bearer не пускает"""
+        response = Client().get(reverse('core:metrics'),
+                                HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.bulk_create(
+            [User(username=f'user{i}') for i in range(12)])
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=100)
+    def test_small_tables_are_counted_exactly(self):
+        """Пока строк меньше лимита, счёт точный"""
+        paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 5)
+        self.assertEqual(paginator.count, 12)
+        self.assertEqual(paginator.num_pages, 3)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=5)
+    def test_filtered_count_stops_at_limit(self):
+        """С фильтром строки считаются не дальше лимита"""
+        queryset = User.objects.filter(
+            username__startswith='user').order_by('pk')
+        self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 5)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=5)
+    def test_unfiltered_count_comes_from_statistics(self):
+        """Без фильтров число строк берётся из sqlite_stat1"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 12)
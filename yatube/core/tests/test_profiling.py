@@ -0,0 +1,81 @@
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import profiling
+from posts.models import Post
+
+User = get_user_model()
+
+
+def timing(response, name):
+    """Поля метрики ``name`` из заголовка Server-Timing."""
+    for metric in response['Server-Timing'].split(', '):
+        parts = metric.split(';')
+        if parts[0] == name:
+            return dict(part.split('=', 1) for part in parts[1:])
+    return None
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.staff = User.objects.create_user('Staff', is_staff=True)
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        profiling.stats.reset()
+
+    def test_server_timing_header(self):
+        """Server-Timing: общее время, запросы к БД, шаблоны и кэш"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('index'))
+        total = float(timing(response, 'total')['dur'])
+        db = timing(response, 'db')
+        self.assertEqual(db['desc'], f'"{len(queries)} queries"')
+        self.assertLessEqual(float(db['dur']), total)
+        self.assertLessEqual(float(timing(response, 'tpl')['dur']), total)
+        self.assertRegex(timing(response, 'cache')['desc'],
+                         r'^"\d+ hits \d+ misses"$')
+
+    def test_aggregates_by_route_name(self):
+        """Агрегаты копятся по имени маршрута"""
+        self.guest_client.get(reverse('index'))
+        self.guest_client.get(reverse('index'))
+        self.guest_client.get(reverse('profile', args=['Author']))
+        routes = profiling.stats.snapshot()
+        self.assertEqual(routes['index']['requests'], 2)
+        self.assertEqual(routes['profile']['requests'], 1)
+        self.assertGreater(routes['index']['db_count'], 0)
+        self.assertGreater(routes['index']['template_time'], 0)
+        self.assertGreater(routes['index']['cache_hits']
+                           + routes['index']['cache_misses'], 0)
+
+    def test_stats_page_is_for_staff(self):
+        """Страница агрегатов доступна только сотрудникам"""
+        url = reverse('core:profiling')
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.guest_client.get(reverse('index'))
+        staff_client = Client()
+        staff_client.force_login(ProfilingMiddlewareTests.staff)
+        response = staff_client.get(url)
+        self.assertContains(response, '<td>index</td>')
+
+    def test_overhead_is_well_under_millisecond(self):
+        """Профилирование запроса стоит много меньше миллисекунды"""
+        iterations = 1000
+        started = perf_counter()
+        for _ in range(iterations):
+            with profiling.profile() as recorder:
+                pass
+            recorder.server_timing(0.01)
+        per_request = (perf_counter() - started) / iterations
+        self.assertLess(per_request, 0.0005)
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Group, Post
+
+from core.routers import STICKY_COOKIE
+
+User = get_user_model()
+
+
+# Реплика в тестах — зеркало default в отдельном соединении: ей видны
+# только закоммиченные данные
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.author = User.objects.create_user('Author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(text='Пост', author=self.author,
+                                        group=self.group)
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def queries(self, method, url, alias, **data):
+        with CaptureQueriesContext(connections[alias]) as context:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        return len(context.captured_queries)
+
+    def test_feeds_read_from_replica(self):
+        """Ленты читаются с реплики"""
+        for url in [reverse('index'), reverse('group_posts', args=['group']),
+                    reverse('profile', args=['Author']),
+                    reverse('follow_index')]:
+            with self.subTest(url=url):
+                self.assertGreater(self.queries('get', url, 'replica'), 0)
+
+    def test_other_views_use_primary(self):
+        """Страница поста и записи идут в основную БД"""
+        url = reverse('post_view', args=['Author', self.post.pk])
+        self.assertEqual(self.queries('get', url, 'replica'), 0)
+        self.assertEqual(
+            self.queries('post', reverse('new_post'), 'replica',
+                         text='Новый пост'), 0)
+
+    def test_reads_stick_to_primary_after_post(self):
+        """После POST ленты автора читаются из основной БД"""
+        response = self.client.post(reverse('new_post'),
+                                    {'text': 'Новый пост'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.queries('get', reverse('index'), 'replica'), 0)
+        self.client.cookies.pop(STICKY_COOKIE)
+        self.assertGreater(
+            self.queries('get', reverse('index'), 'replica'), 0)
+
+    def test_follow_link_sticks_to_primary(self):
+        """После подписки по GET-ссылке профиль читается из основной БД"""
+        reader = User.objects.create_user('Reader')
+        self.client.force_login(reader)
+        response = self.client.get(reverse('profile_follow',
+                                           args=['Author']))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        with CaptureQueriesContext(connections['replica']) as context:
+            response = self.client.get(response.url)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertTrue(response.context['following'])
+
+    def test_plain_reads_do_not_stick(self):
+        """Чтение ленты без записей не переключает на основную БД"""
+        response = self.client.get(reverse('index'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        """Без реплик ленты читаются из основной БД"""
+        self.assertEqual(self.queries('get', reverse('index'), 'replica'), 0)
@@ -0,0 +1,106 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core import sampling
+from core.models import RequestProfile
+from posts.models import Post
+
+User = get_user_model()
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class SamplingProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user('Staff', is_staff=True,
+                                             is_superuser=True)
+        cls.user = User.objects.create_user('User')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(SamplingProfilerTests.staff)
+        self.user_client = Client()
+        self.user_client.force_login(SamplingProfilerTests.user)
+
+    def test_staff_flag_stores_profile_with_sql(self):
+        """?profile=1 сотрудника сохраняет профиль с запросами к БД"""
+        response = self.staff_client.get(reverse('index'), {'profile': 1})
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(profile.view_name, 'index')
+        self.assertEqual(profile.user, SamplingProfilerTests.staff)
+        self.assertEqual(profile.status_code, 200)
+        self.assertTrue(any('"posts_post"' in query['sql']
+                            for query in profile.query_list))
+
+    def test_flag_is_ignored_for_other_users(self):
+        """Обычный пользователь не может включить профайлер"""
+        with mock.patch.object(sampling, 'profile_request') as profile:
+            response = self.user_client.get(reverse('index'),
+                                            {'profile': 1})
+        profile.assert_not_called()
+        self.assertFalse(response.has_header('X-Profile-Id'))
+
+    @override_settings(PROFILER_SAMPLE_RATE=1.0)
+    def test_sample_rate_profiles_any_request(self):
+        """При доле выборки 1 профилируется и запрос гостя"""
+        response = Client().get(reverse('index'))
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertIsNone(profile.user)
+
+    def test_sampler_collects_folded_stacks(self):
+        """Стеки потока запроса сворачиваются для flame graph"""
+        sampler = sampling.Sampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy_wait(0.05)
+        sampler.stop()
+        lines = sampler.folded().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn('core.tests.test_sampling.busy_wait', stack)
+        self.assertLess(stack.index('test_sampler_collects_folded_stacks'),
+                        stack.index('busy_wait'))
+
+    def test_profiles_are_listed_in_admin(self):
+        """Профили видны в админке, стеки скачиваются файлом"""
+        response = self.staff_client.get(reverse('index'), {'profile': 1})
+        profile_id = response['X-Profile-Id']
+        response = self.staff_client.get(
+            reverse('admin:core_requestprofile_changelist'))
+        self.assertContains(response, '/?profile=1')
+        response = self.staff_client.get(
+            reverse('admin:core_requestprofile_change', args=[profile_id]))
+        self.assertContains(response, 'свёрнутые стеки')
+        response = self.staff_client.get(
+            reverse('core:profile_stacks', args=[profile_id]))
+        self.assertIn('.folded', response['Content-Disposition'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaProfilingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def test_queries_to_replicas_are_recorded(self):
+        """Запросы лент к реплике попадают в профиль со своей БД"""
+        staff = User.objects.create_user('Staff', is_staff=True)
+        Post.objects.create(text='Пост', author=staff)
+        client = Client()
+        client.force_login(staff)
+        response = client.get(reverse('index'), {'profile': 1})
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        databases = {query['database'] for query in profile.query_list
+                     if '"posts_post"' in query['sql']}
+        self.assertEqual(databases, {'replica'})
@@ -0,0 +1,162 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.template.loader import get_template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling, slow_queries
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class SlowQueryLogTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user('Author')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def logged(self, url):
+        """Записи журнала за один запрос к ``url``."""
+        with override_settings(SLOW_QUERY_THRESHOLD=0):
+            with self.assertLogs('core.slow_queries') as logs:
+                Client().get(url)
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_entries_carry_view_location_and_plan(self):
+        """Запись знает маршрут, место в коде или шаблоне и план"""
+        entries = self.logged(reverse('profile', args=['Author']))
+        feed = [entry for entry in entries
+                if 'FROM "posts_post"' in entry['sql']
+                and 'LIMIT' in entry['sql']]
+        self.assertTrue(feed)
+        entry = feed[0]
+        self.assertEqual(entry['view'], 'profile')
+        self.assertEqual(entry['path'], '/Author/')
+        self.assertTrue(entry['plan'])
+        self.assertTrue(entry['code'].startswith('posts/'))
+        self.assertEqual(len(entry['fingerprint']), 12)
+
+    def test_template_queries_point_to_template_line(self):
+        """Запрос, выполненный при отрисовке, указывает на шаблон"""
+        post = Post.objects.first()
+        Comment.objects.create(post=post, author=SlowQueryLogTests.user,
+                               text='Комментарий')
+        template = get_template('includes/comment_list.html')
+        with override_settings(SLOW_QUERY_THRESHOLD=0):
+            with self.assertLogs('core.slow_queries') as logs:
+                with profiling.profile():
+                    # Ленивый queryset выполняется в цикле шаблона
+                    template.render({'post': post,
+                                     'comments': post.comments.all()})
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertIn('"posts_comment"', entry['sql'])
+        self.assertRegex(entry['template'],
+                         r'^includes/comment_list\.html:\d+$')
+        self.assertIsNone(entry['view'])
+
+    def test_commands_are_logged_without_view(self):
+        """Запросы management-команды тоже попадают в журнал"""
+        with override_settings(SLOW_QUERY_THRESHOLD=0):
+            with self.assertLogs('core.slow_queries') as logs:
+                call_command('recount_stats', stdout=StringIO())
+        entries = [json.loads(record.getMessage())
+                   for record in logs.records]
+        self.assertTrue(any(
+            entry['code'].startswith('posts/management/commands/'
+                                     'recount_stats.py')
+            for entry in entries))
+        self.assertTrue(all(entry['view'] is None for entry in entries))
+        # EXPLAIN медленного запроса сам в журнал не попадает
+        self.assertFalse(any(entry['sql'].startswith('EXPLAIN')
+                             for entry in entries))
+
+    def test_background_threads_are_logged(self):
+        """Соединение нового потока сразу пишет медленные запросы"""
+        def run():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                connections.close_all()
+
+        with override_settings(SLOW_QUERY_THRESHOLD=0):
+            with self.assertLogs('core.slow_queries') as logs:
+                thread = threading.Thread(target=run)
+                thread.start()
+                thread.join()
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['sql'], 'SELECT 1')
+        self.assertIsNone(entry['view'])
+
+    def test_wrapper_survives_connect_inside_profile(self):
+        """Соединение, открытое внутри profile(), сохраняет обёртку"""
+        wrappers = connection.execute_wrappers
+        self.addCleanup(setattr, connection, 'execute_wrappers',
+                        list(wrappers))
+        with profiling.profile():
+            # Как при первом подключении посреди профилируемого запроса
+            profiling.watch_connection(type(connection), connection)
+            profiling.watch_connection(type(connection), connection)
+        self.assertEqual(connection.execute_wrappers.count(
+            profiling.log_slow), 1)
+        self.assertNotIn(profiling._record_query,
+                         connection.execute_wrappers)
+
+    def test_sensitive_params_are_redacted(self):
+        """Пароли, почта и сессии не попадают в журнал"""
+        sql = ('UPDATE "auth_user" SET "password" = %s, "email" = %s, '
+               '"first_name" = %s WHERE "auth_user"."id" = %s')
+        self.assertEqual(
+            slow_queries.redact(sql, ['hash', 'a@b.c', 'Имя', 1]),
+            ['***', '***', 'Имя', 1])
+        sql = ('INSERT INTO "django_session" ("session_key", '
+               '"session_data", "expire_date") VALUES (%s, %s, %s)')
+        self.assertEqual(slow_queries.redact(sql, ['k', 'd', 'date']),
+                         ['***', '***', 'date'])
+        self.assertEqual(
+            slow_queries.redact('SELECT 1 WHERE "username" = %s AND '
+                                '"password" = %s', ['me', 'secret']),
+            ['me', '***'])
+
+    def test_fingerprint_ignores_literals_and_in_lists(self):
+        """Запросы одной формы получают один отпечаток"""
+        self.assertEqual(
+            slow_queries.fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            slow_queries.fingerprint('select *  from t where id in (%s)'))
+        self.assertEqual(
+            slow_queries.fingerprint("SELECT * FROM t WHERE a = 'x' "
+                                     "LIMIT 10"),
+            slow_queries.fingerprint("SELECT * FROM t WHERE a = 'y' "
+                                     "LIMIT 20"))
+        self.assertNotEqual(slow_queries.fingerprint('SELECT a FROM t'),
+                            slow_queries.fingerprint('SELECT b FROM t'))
+
+    def test_command_ranks_fingerprints(self):
+        """slow_queries ранжирует группы по суммарному времени"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'slow.ndjson')
+        rows = [('aaa', 'SELECT a', 5), ('bbb', 'SELECT b', 50),
+                ('aaa', 'SELECT a', 7)]
+        with open(path, 'w') as file, open(f'{path}.1', 'w') as rotated:
+            for i, (fingerprint, sql, duration) in enumerate(rows):
+                target = rotated if i == 2 else file
+                target.write(json.dumps({
+                    'fingerprint': fingerprint, 'sql': sql,
+                    'duration_ms': duration, 'view': 'index',
+                    'code': 'posts/views.py:1 in index'}) + '\n')
+        out = StringIO()
+        call_command('slow_queries', file=path, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('bbb  1 раз'))
+        self.assertIn('aaa  2 раз, всего 12 мс', out.getvalue())
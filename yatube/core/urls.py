@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('profiling/', views.profiling_stats, name='profiling'),
+    path('metrics/', views.prometheus_metrics, name='metrics'),
+    path('profiles/<int:profile_id>/stacks/', views.profile_stacks,
+         name='profile_stacks'),
+    path('export/', views.export_data, name='export'),
+]
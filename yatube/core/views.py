@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         StreamingHttpResponse)
+from django.shortcuts import get_object_or_404, render
+from django.utils.crypto import constant_time_compare
+
+from posts import export
+
+from . import metrics, profiling
+from .models import RequestProfile
+
+
+def _route_row(route, row):
+    requests = row['requests']
+    lookups = row['cache_hits'] + row['cache_misses']
+    return {
+        'route': route,
+        'requests': requests,
+        'total_time': row['total_time'],
+        'avg_ms': row['total_time'] / requests * 1000,
+        'max_ms': row['max_time'] * 1000,
+        'avg_queries': row['db_count'] / requests,
+        'avg_db_ms': row['db_time'] / requests * 1000,
+        'avg_template_ms': row['template_time'] / requests * 1000,
+        'avg_cache_ms': row['cache_time'] / requests * 1000,
+        'hit_ratio': row['cache_hits'] / lookups if lookups else None,
+    }
+
+
+@staff_member_required
+def profiling_stats(request):
+    """Агрегаты профилирования по маршрутам: дольше всего в сумме — выше."""
+    rows = [_route_row(route, row)
+            for route, row in profiling.stats.snapshot().items()]
+    rows.sort(key=lambda row: row['total_time'], reverse=True)
+    return render(request, 'core/profiling.html', {'rows': rows})
+
+
+def _metrics_allowed(request):
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return True
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def prometheus_metrics(request):
+    """Метрики всех воркеров для Prometheus: сборщику или сотрудникам.
+
+    Сборщик предъявляет токен ``METRICS_TOKEN`` или приходит с адреса из
+    ``METRICS_ALLOWED_IPS``.
+    """
+    if not _metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(metrics.exposition(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
+
+
+@staff_member_required
+def profile_stacks(request, profile_id):
+    """Свёрнутые стеки профиля файлом для flamegraph.pl или speedscope."""
+    profile = get_object_or_404(RequestProfile, pk=profile_id)
+    response = HttpResponse(profile.stacks,
+                            content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = (
+        f'attachment; filename="profile-{profile.pk}.folded"')
+    return response
+
+
+@staff_member_required
+def export_data(request):
+    """Выгрузка NDJSON в gzip потоком; ``?after=posts.post:123`` — продолжить.
+
+    Контрольная точка — модель и pk последней полученной строки.
+    """
+    checkpoint = None
+    if 'after' in request.GET:
+        try:
+            checkpoint = export.parse_checkpoint(request.GET['after'])
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(export.stream(checkpoint),
+                                     content_type='application/gzip')
+    response['Content-Disposition'] = (
+        'attachment; filename="yatube-export.ndjson.gz"')
+    return response
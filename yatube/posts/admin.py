@@ -1,6 +1,9 @@
 from django.contrib import admin
 
+from core.paginators import EstimatedCountPaginator
+
 from .models import Comment, Group, Post
+from .search import match_expression
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -8,12 +11,25 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ("text",)
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
+    # Автор и группа — join'ом, а не запросом на строку
+    list_select_related = ("author", "group")
+    # Выпадающие списки всех пользователей и групп не строим
+    autocomplete_fields = ("author", "group")
+    # Без COUNT(*) по всей таблице на каждой странице
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту — по полнотекстовому индексу, а не LIKE '%...%'
+        expression = match_expression(search_term)
+        if not expression:
+            return queryset, False
+        return queryset.filter(search__text__match=expression), False
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "slug", "description")
     search_fields = ("title",)
-    list_filter = ("title",)
     empty_value_display = "-пусто-"
     prepopulated_fields = {"slug": ("title",)}
 
@@ -21,8 +37,14 @@ class GroupAdmin(admin.ModelAdmin):
 class CommentsAdmin(admin.ModelAdmin):
     list_display = ("post", "author", "text", "created")
     search_fields = ("text",)
-    list_filter = ("text", "author",)
+    # Фильтр по дате не перечисляет значения столбца, в отличие от
+    # фильтров по тексту и автору
+    list_filter = ("created",)
     empty_value_display = "-пусто-"
+    list_select_related = ("post", "author")
+    autocomplete_fields = ("post", "author")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,159 @@
+"""Инвалидация кэша через счётчики поколений.
+
+У каждой области данных есть счётчик поколения в кэше:
+
+* ``post:<id>`` — текст, картинка и комментарии поста;
+* ``author:<id>`` — профиль автора: имя, посты, подписчики;
+* ``group:<slug>`` — название и описание группы;
+* ``follow:<user_id>`` — подписки пользователя;
+* ``feed`` — общая лента на главной: посты и число комментариев к ним;
+* ``feed:group:<slug>``, ``feed:author:<id>`` — то же для ленты группы
+  и ленты профиля (отдельно от ``group:``/``author:``, чтобы комментарий
+  не сбрасывал закэшированные карточки);
+* ``site`` — общее для всех страниц: имена пользователей, названия групп;
+* ``count:<лента>`` — состав ленты ``feed``, ``feed:group:<slug>`` или
+  ``feed:author:<id>``: меняется только с появлением, удалением и
+  переносом поста, а не с каждым комментарием. На нём держится
+  закэшированное число записей ленты (``FeedPaginator``).
+
+Сигналы (см. ``signals.py``) увеличивают счётчики при изменениях, а ключи
+кэша строятся из их текущих значений. Закэшированное ничего не нужно
+удалять: после изменения новый ключ просто перестаёт совпадать со
+старым, и данные могут жить в кэше сколько угодно долго. Стартовое
+значение берётся от времени, чтобы после вытеснения счётчика не вернуться
+к уже использованному поколению.
+
+Вместе с поколением запоминается и время изменения области: из него
+строится заголовок Last-Modified (см. ``conditional.py``).
+"""
+import time
+
+from django.core.cache import cache
+
+GENERATION_TIMEOUT = None  # счётчики поколений не протухают
+FEED = 'feed'
+SITE = 'site'
+
+
+def _initial():
+    return int(time.time() * 1000)
+
+
+def _key(namespace):
+    return f'generation:{namespace}'
+
+
+def _modified_key(namespace):
+    return f'modified:{namespace}'
+
+
+def post_ns(post_id):
+    return f'post:{post_id}'
+
+
+def author_ns(user_id):
+    return f'author:{user_id}'
+
+
+def group_ns(slug):
+    return f'group:{slug}'
+
+
+def follow_ns(user_id):
+    return f'follow:{user_id}'
+
+
+def group_feed_ns(slug):
+    return f'feed:group:{slug}'
+
+
+def author_feed_ns(user_id):
+    return f'feed:author:{user_id}'
+
+
+def count_ns(feed_namespace):
+    return f'count:{feed_namespace}'
+
+
+def bump(*namespaces):
+    """Начинает новое поколение: всё закэшированное по старому устарело."""
+    for namespace in namespaces:
+        try:
+            cache.incr(_key(namespace))
+        except ValueError:
+            cache.set(_key(namespace), _initial(), GENERATION_TIMEOUT)
+    now = time.time()
+    cache.set_many({_modified_key(namespace): now
+                    for namespace in namespaces}, GENERATION_TIMEOUT)
+
+
+def generations(namespaces):
+    """Текущие поколения набора областей одним обращением к кэшу.
+
+    Возвращает словарь ``{область: поколение}``; если счётчик получить не
+    удалось, области в словаре нет и кэшировать по ней нельзя.
+    """
+    keys = {_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _initial(), GENERATION_TIMEOUT)
+        found.update(cache.get_many(missing))
+    return {keys[key]: value for key, value in found.items()}
+
+
+def version(*namespaces):
+    """Строка для ключа кэша, меняющаяся с поколением любой из областей.
+
+    Пустая строка означает, что кэшировать нельзя.
+    """
+    found = generations(namespaces)
+    if len(found) != len(set(namespaces)):
+        return ''
+    return '.'.join(str(found[namespace]) for namespace in namespaces)
+
+
+def last_modified(namespaces):
+    """Время (unix) последнего изменения любой из областей или None.
+
+    Если время какой-то области неизвестно (вытеснено из кэша), отсчёт
+    начинается заново с текущего момента, а сейчас ответа нет.
+    """
+    keys = [_modified_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        now = time.time()
+        for key in keys:
+            if key not in found:
+                cache.add(key, now, GENERATION_TIMEOUT)
+        return None
+    return max(found.values())
+
+
+def post_namespaces(post):
+    # Без author:<id>: его сдвигают каждый новый пост и каждая подписка
+    # на автора, а в карточке от автора только имя (оно — в site)
+    namespaces = [post_ns(post.pk), SITE]
+    if post.group_id:
+        namespaces.append(group_ns(post.group.slug))
+    return namespaces
+
+
+def attach_versions(posts):
+    """Проставляет ``post.cache_version`` для ключа фрагмента карточки.
+
+    Все счётчики страницы читаются одним ``get_many``. Если версию
+    получить не удалось, ``cache_version`` будет пустым и карточка
+    отрисуется без кэша.
+    """
+    posts = list(posts)
+    found = generations({namespace for post in posts
+                         for namespace in post_namespaces(post)})
+    for post in posts:
+        parts = [found.get(namespace) for namespace in post_namespaces(post)]
+        if None in parts:
+            post.cache_version = ''
+        else:
+            post.cache_version = '.'.join(str(part) for part in parts)
+    return posts
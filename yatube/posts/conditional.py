@@ -0,0 +1,111 @@
+"""Условные GET-запросы (ETag / Last-Modified) для лент и страницы поста.
+
+Валидаторы страницы строятся из счётчиков поколений (см. ``cache.py``),
+а не из отрисованного ответа: совпавший ``If-None-Match`` или
+``If-Modified-Since`` получает 304 до запросов страницы и шаблона.
+Клиент, не приславший валидаторов, получает их вместе с обычным ответом.
+
+ETag слабый: в разметке есть маскированный CSRF-токен, который меняется
+при каждой отрисовке, хотя смысл страницы тот же.
+"""
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.timezone import utc
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from . import cache
+from .models import Post
+
+User = get_user_model()
+
+
+def index_namespaces(request):
+    return [cache.FEED]
+
+
+def group_namespaces(request, slug):
+    return [cache.group_ns(slug), cache.group_feed_ns(slug)]
+
+
+def profile_namespaces(request, username):
+    try:
+        user_id = User.objects.values_list('pk', flat=True).get(
+            username=username)
+    except User.DoesNotExist:
+        return None
+    return [cache.author_ns(user_id), cache.author_feed_ns(user_id)]
+
+
+def post_namespaces(request, username, post_id):
+    # Счётчики автора и кнопка подписки зависят от author_ns
+    try:
+        author_id = Post.objects.values_list('author_id', flat=True).get(
+            pk=post_id, author__username=username)
+    except Post.DoesNotExist:
+        return None
+    return [cache.post_ns(post_id), cache.author_ns(author_id)]
+
+
+def _viewer(request):
+    """Часть ETag от читателя: шапка сайта, подписка и форма с CSRF."""
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'{user_id}:{csrf}'
+
+
+def _last_modified(request, namespaces):
+    # Для вошедших страница зависит и от пользователя, а Last-Modified
+    # этого не выражает: им хватает ETag
+    if request.user.is_authenticated:
+        return None
+    modified = cache.last_modified(namespaces)
+    # Заголовок точен до секунды: изменение в ту же секунду, что и ответ,
+    # по нему не отличить
+    if modified is None or modified > time.time() - 1:
+        return None
+    return datetime.fromtimestamp(int(modified), tz=utc)
+
+
+def validators(request, namespaces_func, *args, **kwargs):
+    """ETag и Last-Modified страницы; считаются один раз на запрос.
+
+    ``(None, None)``, если страницы нет (пусть представление ответит
+    404) или поколения недоступны.
+    """
+    if not hasattr(request, '_page_validators'):
+        request._page_validators = (None, None)
+        namespaces = namespaces_func(request, *args, **kwargs)
+        if namespaces is not None:
+            namespaces = [cache.SITE] + namespaces
+            version = cache.version(*namespaces)
+            if version:
+                digest = hashlib.md5(
+                    f'{version}|{_viewer(request)}'.encode()).hexdigest()
+                request._page_validators = (
+                    f'W/"{digest}"', _last_modified(request, namespaces))
+    return request._page_validators
+
+
+def conditional_page(namespaces_func):
+    """Декоратор: 304 Not Modified, если области страницы не менялись.
+
+    ``namespaces_func(request, *args, **kwargs)`` — области кэша, от
+    которых зависит страница. ``no-cache`` заставляет браузер каждый раз
+    сверяться с сервером, а не показывать страницу по эвристике свежести.
+    """
+    def etag(request, *args, **kwargs):
+        return validators(request, namespaces_func, *args, **kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return validators(request, namespaces_func, *args, **kwargs)[1]
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view)
+        return cache_control(private=True, no_cache=True)(view)
+    return decorator
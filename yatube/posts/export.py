@@ -0,0 +1,79 @@
+"""Потоковая выгрузка групп, постов, комментариев и подписок в NDJSON.
+
+``dumpdata`` собирает все объекты в памяти разом. Здесь каждая таблица
+читается пачками по первичному ключу (``pk > последний`` с ``LIMIT``):
+в памяти одна пачка, а запрос каждой пачки идёт по индексу, как бы
+далеко ни ушла выгрузка. Строка выгрузки — объект в формате
+``dumpdata``: ``{"model": "posts.post", "pk": 1, "fields": {...}}``;
+внешние ключи — значения id.
+
+Каждая пачка сжимается в отдельный член gzip. Несколько членов подряд —
+корректный gzip-файл (``gzip -dc`` читает его целиком), поэтому
+выгрузку можно оборвать после любой пачки и продолжить с контрольной
+точки ``posts.post:123`` — модели и последнего выгруженного ключа.
+Пользователи не выгружаются: в их строках пароли и почта.
+"""
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Group, Post
+
+# Порядок важен при загрузке: сначала то, на что ссылаются
+MODELS = (Group, Post, Comment, Follow)
+CHUNK_SIZE = 1000
+# 16 + MAX_WBITS: zlib пишет заголовок и контрольную сумму gzip
+GZIP_WBITS = 31
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def parse_checkpoint(value):
+    """``'posts.post:123'`` → ``('posts.post', 123)``; ValueError иначе."""
+    name, _, pk = value.rpartition(':')
+    if name not in {label(model) for model in MODELS}:
+        raise ValueError(f'Неизвестная модель в контрольной точке: {value}')
+    return name, int(pk)
+
+
+def chunks(checkpoint=None, chunk_size=CHUNK_SIZE):
+    """Пачки выгрузки: ``(модель, последний pk, строки NDJSON в байтах)``.
+
+    С контрольной точкой ``(модель, pk)`` выгрузка продолжается со
+    следующей после неё строки.
+    """
+    name, after = checkpoint or (label(MODELS[0]), 0)
+    labels = [label(model) for model in MODELS]
+    for model in MODELS[labels.index(name):]:
+        fields = [field for field in model._meta.concrete_fields
+                  if not field.primary_key]
+        names = [field.name for field in fields]
+        queryset = model.objects.order_by('pk').values_list(
+            'pk', *[field.attname for field in fields])
+        while True:
+            rows = list(queryset.filter(pk__gt=after)[:chunk_size])
+            if not rows:
+                break
+            after = rows[-1][0]
+            lines = ''.join(
+                json.dumps({'model': label(model), 'pk': row[0],
+                            'fields': dict(zip(names, row[1:]))},
+                           cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                for row in rows)
+            yield label(model), after, lines.encode()
+        after = 0
+
+
+def gzip_member(data):
+    """Данные одним членом gzip."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def stream(checkpoint=None, chunk_size=CHUNK_SIZE):
+    """Сжатая выгрузка по пачкам для StreamingHttpResponse."""
+    for _, _, data in chunks(checkpoint, chunk_size):
+        yield gzip_member(data)
@@ -0,0 +1,168 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Пост автора раскладывается по лентам подписчиков в момент публикации,
+поэтому чтение ``follow_index`` — это диапазон по индексу
+``(user, pub_date)`` вместо join ``Follow`` × ``Post`` с сортировкой.
+Когда у автора становится больше ``FEED_FANOUT_LIMIT`` подписчиков, он
+переводится на чтение при показе (``UserStats.feed_pull``): его посты не
+раскладываются, лента подмешивает их при чтении (fan-out on read).
+
+Обратно автор возвращается, только когда подписчиков не больше
+``FEED_FANOUT_RESUME_LIMIT``, и не в запросе отписки: ленты всех его
+подписчиков заполняет команда ``refill_feeds`` (``resume_fanout``). Два
+порога не дают автору у границы переключаться на каждой подписке.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Max
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+FEED_ORDERING = ('-feed_date', '-feed_id')
+BATCH_SIZE = 500
+
+# Посты автора из диапазона id его подписок — в ленты подписчиков
+RESUME_FANOUT_SQL = """
+    INSERT OR IGNORE INTO posts_feedentry (user_id, post_id, author_id,
+                                           pub_date)
+    SELECT f.user_id, p.id, p.author_id, p.pub_date
+    FROM posts_follow f
+    JOIN posts_post p ON p.author_id = f.author_id
+    WHERE f.author_id = %s AND f.id BETWEEN %s AND %s AND p.id > %s
+    AND p.id IN (SELECT id FROM posts_post WHERE author_id = %s
+                 ORDER BY pub_date DESC, id DESC LIMIT %s)
+"""
+
+
+def is_fanout_author(author_id):
+    """Раскладывать ли посты автора по лентам при публикации."""
+    return not UserStats.objects.filter(user_id=author_id,
+                                        feed_pull=True).exists()
+
+
+def pull_author_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    return list(
+        Follow.objects.filter(
+            user=user, author__stats__feed_pull=True,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def stop_fanout(**filters):
+    """Переводит авторов, у которых подписчиков больше лимита, на чтение
+    при показе. Уже разложенные посты остаются в лентах."""
+    return UserStats.objects.filter(
+        feed_pull=False,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        **filters,
+    ).update(feed_pull=True)
+
+
+def resume_candidates():
+    """Авторы на чтении при показе, которых пора вернуть к раскладке."""
+    return UserStats.objects.filter(
+        feed_pull=True,
+        followers_count__lte=settings.FEED_FANOUT_RESUME_LIMIT,
+    ).values_list('user_id', flat=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .values_list('user_id', flat=True))
+    entries = (FeedEntry(user_id=user_id, post=post,
+                         author_id=post.author_id, pub_date=post.pub_date)
+               for user_id in followers.iterator())
+    _bulk_insert(entries)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту недавние посты автора после подписки."""
+    if not is_fanout_author(author_id):
+        return
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('id', 'pub_date')
+             [:settings.FEED_BACKFILL_LIMIT])
+    entries = (FeedEntry(user_id=user_id, post_id=post_id,
+                         author_id=author_id, pub_date=pub_date)
+               for post_id, pub_date in posts)
+    _bulk_insert(entries)
+
+
+def resume_fanout(author_id, batch_size=BATCH_SIZE):
+    """Возвращает автора к раскладке и заполняет ленты его подписчиков.
+
+    Пока автор читался при показе, его новые посты не попадали в ленты.
+    Сначала последние ``FEED_BACKFILL_LIMIT`` постов раскладываются по
+    лентам пачками подписок, затем автор переключается, и отдельно
+    докладываются посты, опубликованные за время заполнения. Для
+    ``refill_feeds``: на тысячах подписчиков это миллионы строк.
+    """
+    last_post_id = (Post.objects.filter(author_id=author_id)
+                    .aggregate(last=Max('id'))['last'] or 0)
+    _fill_followers(author_id, 0, batch_size)
+    UserStats.objects.filter(user_id=author_id).update(feed_pull=False)
+    _fill_followers(author_id, last_post_id, batch_size)
+
+
+def _fill_followers(author_id, after_post_id, batch_size):
+    follows = (Follow.objects.filter(author_id=author_id).order_by('id')
+               .values_list('id', flat=True))
+    last_id = 0
+    while True:
+        # Пачка — диапазон id подписок автора, каждая в своей транзакции
+        ids = list(follows.filter(id__gt=last_id)[:batch_size])
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(RESUME_FANOUT_SQL, [
+                author_id, ids[0], ids[-1], after_post_id,
+                author_id, settings.FEED_BACKFILL_LIMIT,
+            ])
+        last_id = ids[-1]
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def follow_feed_sources(user):
+    """Querysets ленты подписок для MergedCursorPaginator.
+
+    Обе выборки размечены одинаковыми ``feed_date``/``feed_id``, чтобы
+    курсор был общим, а материализованная часть шла по индексу ленты.
+    """
+    sources = [
+        Post.objects.for_feed().filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_id=F('feed_entries__post_id'),
+        ),
+    ]
+    pull_ids = pull_author_ids(user)
+    if pull_ids:
+        sources.append(
+            Post.objects.for_feed().filter(author_id__in=pull_ids).annotate(
+                feed_date=F('pub_date'), feed_id=F('id'),
+            )
+        )
+    return sources
+
+
+def follow_feed_queryset(user):
+    """Прямой запрос ленты: для старых ссылок ?page=N."""
+    return Post.objects.for_feed().filter(author__following__user=user)
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -17,6 +19,18 @@ class PostForm(forms.ModelForm):
             'group': _('Выберите группу, либо оставьте поле пустым'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Новый файл; уже сохранённую картинку поста не трогаем
+        if not isinstance(image, UploadedFile):
+            return image
+        # ImageField уже открыл файл: размеры прочитаны из заголовка
+        if uploads.too_large(*image.image.size):
+            raise forms.ValidationError(
+                _('Слишком большое изображение: уменьшите его и загрузите '
+                  'снова'))
+        return uploads.normalize(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
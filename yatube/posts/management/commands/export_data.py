@@ -0,0 +1,74 @@
+import json
+import os
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в NDJSON, '
+            'сжатый gzip; прерванная выгрузка продолжается с того же места')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='export.ndjson.gz')
+        parser.add_argument('--chunk-size', type=int,
+                            default=export.CHUNK_SIZE,
+                            help='Сколько строк читать за запрос')
+        parser.add_argument('--checkpoint',
+                            help='Файл контрольной точки (по умолчанию '
+                                 '<output>.checkpoint)')
+
+    def handle(self, *args, **options):
+        path = options['output']
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        state = self.load_state(checkpoint_path)
+        if state is not None and not os.path.exists(path):
+            raise CommandError(f'Есть контрольная точка {checkpoint_path}, '
+                               f'но нет файла выгрузки {path}')
+        if state is None:
+            file = open(path, 'wb')
+            checkpoint = None
+        else:
+            # Хвост после последней полной пачки отбрасывается
+            file = open(path, 'r+b')
+            file.truncate(state['offset'])
+            file.seek(state['offset'])
+            checkpoint = (state['model'], state['pk'])
+            self.stdout.write(
+                f'Продолжаем после {state["model"]}:{state["pk"]}')
+        counts = Counter()
+        with file:
+            for model, pk, data in export.chunks(checkpoint,
+                                                 options['chunk_size']):
+                file.write(export.gzip_member(data))
+                file.flush()
+                os.fsync(file.fileno())
+                counts[model] += data.count(b'\n')
+                self.save_state(checkpoint_path, {
+                    'model': model, 'pk': pk, 'offset': file.tell()})
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        for model, count in counts.items():
+            self.stdout.write(f'  {model}: {count}')
+        self.stdout.write(f'Выгрузка записана в {path}')
+
+    def load_state(self, checkpoint_path):
+        if not os.path.exists(checkpoint_path):
+            return None
+        try:
+            with open(checkpoint_path) as file:
+                state = json.load(file)
+            export.parse_checkpoint(f'{state["model"]}:{state["pk"]}')
+        except (ValueError, KeyError) as error:
+            raise CommandError(
+                f'Повреждена контрольная точка {checkpoint_path}: {error}')
+        return state
+
+    def save_state(self, checkpoint_path, state):
+        # Через временный файл: оборванная запись не испортит точку
+        temporary = f'{checkpoint_path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, checkpoint_path)
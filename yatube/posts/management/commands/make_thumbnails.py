@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие миниатюры картинок постов: для картинок, '
+            'загруженных до фонового пула, и для потерянных задач')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько постов проверять за запрос')
+
+    def handle(self, *args, **options):
+        posts = (Post.objects.exclude(image='').exclude(image=None)
+                 .only('id', 'image').order_by('id'))
+        last_id = 0
+        checked = made = failed = 0
+        while True:
+            batch = list(posts.filter(id__gt=last_id)
+                         [:options['batch_size']])
+            if not batch:
+                break
+            # Наличие миниатюр — одним обращением к KV-хранилищу на пачку
+            for post in thumbnails.attach_thumbnails(batch, retry=False):
+                if post.thumbnail is not None and post.webp_srcset:
+                    continue
+                if thumbnails.generate(post.pk, post.image.name):
+                    made += 1
+                else:
+                    failed += 1
+            checked += len(batch)
+            last_id = batch[-1].pk
+            self.stdout.write(f'  проверено {checked}, создано {made}',
+                              ending='\r')
+        self.stdout.write(f'Проверено постов: {checked}, миниатюры созданы '
+                          f'для {made}, не удалось: {failed}')
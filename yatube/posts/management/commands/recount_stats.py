@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import cache
+from posts.stats import count_for, save_counts
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики профилей (UserStats) для всех пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько пользователей обрабатывать за раз')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+        while True:
+            user_ids = list(User.objects.filter(pk__gt=last_id)
+                            .order_by('pk')
+                            .values_list('pk', flat=True)[:batch_size])
+            if not user_ids:
+                break
+            save_counts(count_for(user_ids))
+            # bulk_update не шлёт сигналов: карточки профилей сбрасываем сами
+            cache.bump(*[cache.author_ns(user_id) for user_id in user_ids])
+            total += len(user_ids)
+            last_id = user_ids[-1]
+        self.stdout.write(f'Пересчитаны счётчики {total} пользователей')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+
+
+class Command(BaseCommand):
+    help = ('Возвращает к раскладке по лентам авторов, у которых подписчиков '
+            'стало не больше FEED_FANOUT_RESUME_LIMIT, и заполняет ленты их '
+            'подписчиков; запускать по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=feeds.BATCH_SIZE,
+                            help='Сколько подписок заполнять за запрос')
+
+    def handle(self, *args, **options):
+        total = 0
+        for author_id in list(feeds.resume_candidates()):
+            # Содержимое лент не меняется: те же посты раньше подмешивались
+            # при чтении, поэтому кэш сбрасывать не нужно
+            feeds.resume_fanout(author_id, options['batch_size'])
+            total += 1
+            self.stdout.write(f'  автор {author_id}: ленты заполнены')
+        self.stdout.write(f'Возвращено к раскладке авторов: {total}')
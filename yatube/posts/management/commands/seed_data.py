@@ -0,0 +1,272 @@
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts import feeds
+from posts.models import Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+WORDS = (
+    'кот собака утро вечер город море лес дорога книга музыка кофе чай '
+    'работа отпуск поезд самолёт горы река дождь солнце снег друг семья '
+    'фильм сериал концерт выставка парк велосипед бег футбол шахматы '
+    'рецепт ужин завтрак новости погода проект код релиз баг тест'
+).split()
+
+# Последние FEED_BACKFILL_LIMIT постов каждого автора, кроме тех, чьи
+# посты подмешиваются при чтении (см. posts/feeds.py). Граница по дате —
+# один поиск по индексу (author, -pub_date, -id) на подписку.
+FILL_FEEDS_SQL = """
+    INSERT OR IGNORE INTO posts_feedentry (user_id, post_id, author_id,
+                                           pub_date)
+    SELECT f.user_id, p.id, p.author_id, p.pub_date
+    FROM posts_follow f
+    JOIN posts_userstats s ON s.user_id = f.author_id AND NOT s.feed_pull
+    JOIN posts_post p ON p.author_id = f.author_id
+    WHERE p.pub_date >= COALESCE((
+        SELECT pub_date FROM posts_post
+        WHERE author_id = f.author_id
+        ORDER BY pub_date DESC, id DESC LIMIT 1 OFFSET %s), '')
+    AND f.id BETWEEN %s AND %s
+"""
+
+
+class ZipfSampler:
+    """Индекс от 0 до count - 1 с вероятностью ~ 1 / (k + 1) ** exponent.
+
+    Обратная функция распределения непрерывного степенного закона:
+    без таблицы весов, поэтому годится и для миллионов постов.
+    """
+
+    def __init__(self, count, exponent, rng):
+        self.count = count
+        self.power = 1 - exponent
+        self.rng = rng
+
+    def __call__(self):
+        u = self.rng.random()
+        if abs(self.power) < 1e-9:
+            x = (self.count + 1) ** u
+        else:
+            x = (1 + u * ((self.count + 1) ** self.power - 1)) ** (
+                1 / self.power)
+        return min(int(x) - 1, self.count - 1)
+
+
+@contextmanager
+def manual_dates():
+    """Даёт bulk_create записать свои даты вместо auto_now_add.
+
+    Флаг меняется у поля модели, то есть для всего процесса: пока блок
+    открыт, обычное сохранение поста или комментария в другом потоке
+    останется без даты. Поэтому команду запускают только отдельным
+    процессом ``manage.py seed_data``, а не ``call_command`` внутри
+    работающего сервера.
+    """
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def new_ids(model, after):
+    """Id строк, вставленных после ``after``: range, если они идут подряд.
+
+    Иначе — компактный массив, заполненный потоком из курсора: по 8 байт
+    на id вместо объекта int в списке.
+    """
+    rows = (model.objects.filter(pk__gt=after).order_by('pk')
+            .values_list('pk', flat=True))
+    first, last = rows.first(), rows.last()
+    if first is None:
+        return range(0)
+    if last - first + 1 == rows.count():
+        return range(first, last + 1)
+    return array('q', rows.iterator())
+
+
+def max_id(model):
+    return (model.objects.order_by('-pk').values_list('pk', flat=True)
+            .first() or 0)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет БД реалистичными данными для нагрузочных тестов: '
+            'популярность авторов и постов распределена по закону Ципфа')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows-per-user', type=int, default=20,
+                            help='Среднее число подписок на пользователя')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель закона Ципфа (больше — '
+                                 'сильнее перекос к популярным)')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-feeds', action='store_true',
+                            help='Не заполнять ленты подписок (FeedEntry)')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days'])
+
+        user_ids = self.seed_users(options['users'])
+        group_ids = self.seed_groups(options['groups'])
+        with manual_dates():
+            post_ids = self.seed_posts(options['posts'], user_ids, group_ids)
+            self.seed_comments(options['comments'], user_ids, post_ids)
+        self.seed_follows(user_ids, options['follows_per_user'])
+
+        self.stdout.write('Пересчёт счётчиков профилей...')
+        call_command('recount_stats', stdout=self.stdout)
+        # Популярных авторов лента читает при показе
+        feeds.stop_fanout()
+        if not options['skip_feeds']:
+            self.fill_feeds()
+        # Статистика для планировщика и оценки числа строк в админке
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # bulk_create не шлёт сигналов: поколения лент, групп, подписок и
+        # сайта не сдвинулись, и закэшированные страницы, ETag и число
+        # страниц лент остались бы старыми. Счётчики поколений начнутся
+        # заново со значения от текущего времени (см. posts/cache.py)
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def insert(self, model, objects, total, **kwargs):
+        """bulk_create пачками в транзакциях, с прогрессом."""
+        batch = []
+        done = 0
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, **kwargs)
+                done += len(batch)
+                batch = []
+                self.stdout.write(f'  {model.__name__}: {done}/{total}',
+                                  ending='\r')
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            done += len(batch)
+        self.stdout.write(f'  {model.__name__}: {done}/{total}')
+
+    def random_date(self):
+        return self.now - self.period * self.rng.random()
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choice(WORDS)
+                        for _ in range(self.rng.randint(low, high)))
+
+    def seed_users(self, count):
+        after = max_id(User)
+        # Хэш пароля дорогой: один на всех
+        password = make_password('password')
+        self.insert(User, (User(username=f'user{after + i}',
+                                password=password)
+                           for i in range(1, count + 1)), count)
+        return new_ids(User, after)
+
+    def seed_groups(self, count):
+        after = max_id(Group)
+        self.insert(Group, (Group(title=f'Сообщество {after + i}',
+                                  slug=f'group-{after + i}',
+                                  description=self.text(5, 20))
+                            for i in range(1, count + 1)), count)
+        return new_ids(Group, after)
+
+    def seed_posts(self, count, user_ids, group_ids):
+        after = max_id(Post)
+        author = ZipfSampler(len(user_ids), self.skew, self.rng)
+
+        def posts():
+            for _ in range(count):
+                group_id = None
+                if group_ids and self.rng.random() < 0.3:
+                    group_id = self.rng.choice(group_ids)
+                yield Post(text=self.text(5, 60),
+                           author_id=user_ids[author()],
+                           group_id=group_id,
+                           pub_date=self.random_date())
+        self.insert(Post, posts(), count)
+        return new_ids(Post, after)
+
+    def seed_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        # Обсуждают в основном немногие популярные посты
+        post = ZipfSampler(len(post_ids), self.skew, self.rng)
+        comments = (Comment(post_id=post_ids[post()],
+                            author_id=self.rng.choice(user_ids),
+                            text=self.text(2, 30),
+                            created=self.random_date())
+                    for _ in range(count))
+        self.insert(Comment, comments, count)
+
+    def seed_follows(self, user_ids, per_user):
+        if len(user_ids) < 2:
+            return
+        # Подписываются в основном на немногих популярных авторов
+        author = ZipfSampler(len(user_ids), self.skew, self.rng)
+
+        def follows():
+            for user_id in user_ids:
+                wanted = min(self.rng.randint(0, 2 * per_user),
+                             len(user_ids) - 1)
+                authors = set()
+                for _ in range(wanted * 3):
+                    if len(authors) >= wanted:
+                        break
+                    author_id = user_ids[author()]
+                    if author_id != user_id:
+                        authors.add(author_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+        total = len(user_ids) * per_user
+        self.insert(Follow, follows(), f'~{total}', ignore_conflicts=True)
+
+    def fill_feeds(self):
+        """Ленты подписок одним INSERT ... SELECT на пачку подписок.
+
+        То же, что ``feeds.backfill`` для каждой подписки, но без
+        объектов в Python: при миллионах строк ленты это на порядки
+        быстрее.
+        """
+        self.stdout.write('Заполнение лент подписок...')
+        # Диапазоны id, а не список всех подписок: пропуски в id не мешают
+        last = max_id(Follow)
+        step = self.batch_size
+        for start in range(1, last + 1, step):
+            end = min(start + step - 1, last)
+            with connection.cursor() as cursor:
+                cursor.execute(FILL_FEEDS_SQL, [
+                    settings.FEED_BACKFILL_LIMIT - 1,
+                    start, end,
+                ])
+            self.stdout.write(f'  подписок: id {end}/{last}', ending='\r')
+        self.stdout.write(f'  лента: {FeedEntry.objects.count()} записей')
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:53
+
+from django.db import migrations, models
+
+# Имя, которое Django дал индексу db_index=True на posts_post.pub_date
+PUB_DATE_INDEX = 'posts_post_pub_date_131c7f8d'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_composite_indexes'),
+    ]
+
+    operations = [
+        # AlterField пересоздал бы posts_post в SQLite вместе с триггерами
+        # поиска; индекс — начало post_pub_date_id_idx, его достаточно удалить
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='post',
+                    name='pub_date',
+                    field=models.DateTimeField(auto_now_add=True, verbose_name='Дата публикации'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    f'DROP INDEX IF EXISTS {PUB_DATE_INDEX}',
+                    f'CREATE INDEX {PUB_DATE_INDEX} '
+                    f'ON posts_post (pub_date)',
+                ),
+            ],
+        ),
+    ]
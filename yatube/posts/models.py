@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, Lookup, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 User = get_user_model()
 
@@ -13,33 +15,105 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Всё, что нужно карточке поста, за один запрос.
+
+        Автор и группа подтягиваются join'ом, число комментариев —
+        коррелированным подзапросом: он выполняется только для строк
+        страницы (после LIMIT), а не для всей таблицы, как GROUP BY.
+        """
+        comments = (Comment.objects.filter(post=OuterRef('pk'))
+                    .order_by().values('post')
+                    .annotate(total=Count('*')).values('total'))
+        return self.select_related('author', 'group').annotate(
+            comment_count=Coalesce(
+                Subquery(comments, output_field=models.IntegerField()), 0),
+        )
+
+
 class Post(models.Model):
     text = models.TextField()
-    pub_date = models.DateTimeField('Дата публикации', auto_now_add=True,
-                                    db_index=True)
+    # Отдельные индексы по pub_date, author и group не нужны: это начало
+    # составных
+    pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='author_posts')
+                               related_name='author_posts', db_index=False)
     group = models.ForeignKey(Group, on_delete=models.SET_NULL, blank=True,
-                              null=True, related_name="posts_in_group")
+                              null=True, related_name="posts_in_group",
+                              db_index=False)
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
-        ordering = ['-pub_date']
+        # id различает записи с одинаковой датой: без него курсорная
+        # паджинация могла бы пропускать или повторять записи
+        ordering = ['-pub_date', '-id']
+        # Индекс под каждую ленту: выборка страницы идёт по индексу
+        # без сортировки
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class FullTextField(models.TextField):
+    """Колонка полнотекстового индекса FTS5, поддерживает ``__match``."""
+
+
+@FullTextField.register_lookup
+class FullTextMatch(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class PostSearch(models.Model):
+    """Полнотекстовый индекс текстов постов (виртуальная таблица FTS5).
+
+    Таблицу создаёт миграция, а триггеры в БД поддерживают её при любых
+    изменениях ``posts_post``, в том числе массовых. SQLite пересоздаёт
+    таблицу при изменении полей поста, и триггеры при этом теряются:
+    миграция, меняющая поля ``Post``, должна создать их заново (см. 0010).
+    ``rank`` — релевантность bm25 (чем меньше, тем лучше), доступна только
+    вместе с ``__match``.
+    """
+    post = models.OneToOneField(Post, on_delete=models.DO_NOTHING,
+                                primary_key=True, db_column='rowid',
+                                related_name='search')
+    text = FullTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
-                             related_name="comments")
+                             related_name="comments", db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='comments')
     text = models.TextField()
     created = models.DateTimeField('Дата комментария', auto_now_add=True)
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -49,7 +123,8 @@ class Follow (models.Model):
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
                              related_name='follower',
-                             verbose_name='Тот, кто подписывается')
+                             verbose_name='Тот, кто подписывается',
+                             db_index=False)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name='following',
@@ -57,6 +132,64 @@ class Follow (models.Model):
 
     class Meta:
         ordering = ['-author']
+        # Индекс ограничения заодно обслуживает выборки по user
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class FeedEntry(models.Model):
+    """Запись в материализованной ленте подписок: пост в ленте читателя.
+
+    Заполняется при публикации поста (fan-out on write), дополняется
+    при подписке и чистится при отписке. Авторы с огромным числом
+    подписчиков сюда не пишутся — их посты подмешиваются при чтении.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    # Копия post.pub_date: лента читается по индексу без join и сортировки
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user_id}'
+
+
+class UserStats(models.Model):
+    """Счётчики профиля пользователя.
+
+    Меняются атомарно (``UPDATE ... SET n = n + 1``) при создании и
+    удалении постов и подписок, поэтому карточка профиля читает их одной
+    строкой вместо трёх ``COUNT(*)``. Расхождения правит команда
+    ``recount_stats``.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.IntegerField('Записей', default=0)
+    followers_count = models.IntegerField('Подписчиков', default=0)
+    following_count = models.IntegerField('Подписок', default=0)
+    # Посты не раскладываются по лентам, а читаются при показе
+    # (см. feeds.py)
+    feed_pull = models.BooleanField('Лента при чтении', default=False)
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
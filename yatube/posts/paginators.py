@@ -0,0 +1,235 @@
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .cache import version as generation_version
+
+CURSOR_SALT = 'posts.cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+# Число записей ленты живёт до следующего поколения, но не дольше суток
+COUNT_TIMEOUT = 60 * 60 * 24
+
+
+def encode_cursor(direction, values):
+    """Упаковывает позицию в ленте в непрозрачный подписанный токен."""
+    payload = [direction]
+    for value in values:
+        if hasattr(value, 'isoformat'):
+            # Микросекунды важны: по ним различаются записи одной секунды
+            payload.append(['dt', value.isoformat()])
+        else:
+            payload.append(value)
+    return signing.dumps(payload, salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    """Возвращает (направление, значения) или None для битого токена."""
+    try:
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, list) or not payload:
+        return None
+    direction, raw_values = payload[0], payload[1:]
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    values = []
+    for value in raw_values:
+        if isinstance(value, list):
+            value = parse_datetime(value[1])
+        values.append(value)
+    return direction, values
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу сортировки (keyset pagination).
+
+    Страница выбирается условием ``(pub_date, id) < (курсор)`` по индексу,
+    поэтому не нужны ни ``COUNT(*)``, ни ``OFFSET``: время выборки не
+    зависит от того, насколько глубоко читатель пролистал ленту.
+    Общее число страниц неизвестно, навигация только «новее/старше».
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = list(ordering)
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.descending = ordering[0].startswith('-')
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def _keyset_filter(self, values, forward):
+        # (a, b) < (x, y)  <=>  a <= x AND (a < x OR (a = x AND b < y)).
+        # Без первого условия SQLite не видит диапазона по индексу и
+        # проходит его с начала (или сливает OR и сортирует всё старое)
+        lookup = 'lt' if forward == self.descending else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            term = Q(**{f'{field}__{lookup}': values[i]})
+            for prev_field, prev_value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{prev_field: prev_value})
+            condition |= term
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & condition
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else f'-{field}'
+                for field in self.ordering]
+
+    def _position(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _rows(self, condition, ordering, limit):
+        return list(self.object_list.filter(condition)
+                    .order_by(*ordering)[:limit])
+
+    def get_page(self, cursor):
+        """Возвращает страницу по токену курсора, битый токен — первая."""
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None and len(position[1]) != len(self.fields):
+            position = None
+        limit = self.per_page + 1
+        has_newer = False
+
+        if position is None:
+            rows = self._rows(Q(), self.ordering, limit)
+            has_older = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        elif position[0] == NEXT:
+            rows = self._rows(self._keyset_filter(position[1], forward=True),
+                              self.ordering, limit)
+            has_older = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_newer = True
+        else:
+            rows = self._rows(self._keyset_filter(position[1], forward=False),
+                              self._reversed_ordering(), limit)
+            has_newer = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_older = True
+            if not rows:
+                # Всё, что было новее, удалили: показываем начало ленты
+                return self.get_page(None)
+
+        if rows and has_older:
+            self.next_cursor = encode_cursor(NEXT, self._position(rows[-1]))
+        if rows and has_newer:
+            self.previous_cursor = encode_cursor(
+                PREVIOUS, self._position(rows[0]))
+        return Page(rows, 1, self)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорный паджинатор поверх нескольких querysets.
+
+    Из каждого источника берётся не больше страницы, результаты сливаются
+    по ключу сортировки, дубликаты по pk отбрасываются. Поля сортировки
+    должны быть у всех источников (например, через annotate).
+    """
+
+    def _rows(self, condition, ordering, limit):
+        rows = {}
+        for queryset in self.object_list:
+            for obj in queryset.filter(condition).order_by(*ordering)[:limit]:
+                rows.setdefault(obj.pk, obj)
+        descending = ordering[0].startswith('-')
+        return sorted(rows.values(), key=self._position,
+                      reverse=descending)[:limit]
+
+
+class FeedPaginator(Paginator):
+    """Нумерованные страницы ленты.
+
+    Считает записи без аннотаций карточки: иначе ``COUNT(*)`` оборачивает
+    запрос с подзапросом числа комментариев и группировкой и вычисляет
+    его для каждой записи ленты. Если переданы ``namespaces`` (области
+    состава ленты ``count:…``, см. ``cache.py``), число записей кэшируется
+    до следующего нового, удалённого или перенесённого поста, а не
+    считается на каждый запрос.
+
+    Навигация показывает только окно страниц вокруг текущей, первую и
+    последнюю доступную: ``page.window`` — номера страниц, ``None`` на
+    месте пропуска.
+    """
+    on_each_side = 2
+
+    def __init__(self, object_list, per_page, namespaces=(), **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.namespaces = list(namespaces)
+
+    def _count(self):
+        return self.object_list.values('pk').count()
+
+    @cached_property
+    def count(self):
+        version = ''
+        if self.namespaces:
+            version = generation_version(*self.namespaces)
+        if not version:
+            return self._count()
+        key = f'feed_count:{",".join(self.namespaces)}:{version}'
+        count = cache.get(key)
+        if count is None:
+            count = self._count()
+            cache.set(key, count, COUNT_TIMEOUT)
+        return count
+
+    @property
+    def last_page(self):
+        # Глубже PAGINATOR_MAX_PAGE страницы не обслуживаются
+        return min(self.num_pages, settings.PAGINATOR_MAX_PAGE)
+
+    def window(self, number):
+        last = self.last_page
+        start = max(number - self.on_each_side, 1)
+        end = min(number + self.on_each_side, last)
+        pages = list(range(start, end + 1))
+        # Пропуск в одну страницу нагляднее показать самой страницей
+        if start > 3:
+            pages[:0] = [1, None]
+        else:
+            pages[:0] = range(1, start)
+        if end < last - 2:
+            pages += [None, last]
+        else:
+            pages += range(end + 1, last + 1)
+        return pages
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        page.window = self.window(page.number)
+        return page
+
+
+def paginate(request, queryset, ordering=('-pub_date', '-id'),
+             cursor_paginator=None, namespaces=()):
+    """Страница ленты для запроса.
+
+    По умолчанию и при ``?cursor=`` лента листается по курсору
+    (``cursor_paginator``, если передан). Старые ссылки вида ``?page=N``
+    продолжают работать через обычный Paginator по ``queryset``, но только
+    для первых ``PAGINATOR_MAX_PAGE`` страниц: глубже OFFSET слишком дорог.
+    ``namespaces`` — области кэша, с которыми меняется число записей ленты.
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None and 'cursor' not in request.GET:
+        try:
+            number = int(page_number)
+        except ValueError:
+            number = 1
+        if number > settings.PAGINATOR_MAX_PAGE:
+            raise Http404('Слишком глубокая страница, используйте курсор')
+        paginator = FeedPaginator(queryset.order_by(*ordering),
+                                  settings.POSTS_PER_PAGE, namespaces)
+        return paginator.get_page(page_number)
+
+    if cursor_paginator is None:
+        cursor_paginator = CursorPaginator(queryset, settings.POSTS_PER_PAGE,
+                                           ordering)
+    return cursor_paginator.get_page(request.GET.get('cursor'))
@@ -0,0 +1,54 @@
+"""Полнотекстовый поиск по постам.
+
+Поиск идёт по инвертированному индексу FTS5 (модель ``PostSearch``):
+выборка совпадений не просматривает таблицу постов, а результаты
+упорядочены по релевантности bm25. Страницы листаются курсором по
+``(search_rank, id)``, поэтому глубина пролистывания не стоит OFFSET.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Value
+
+from .models import Post
+
+SEARCH_ORDERING = ('search_rank', 'id')
+# Длинные запросы обрезаются: каждое слово — отдельный проход по индексу
+MAX_TERMS = 8
+
+TERM_RE = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Запрос читателя в выражение MATCH.
+
+    Все слова обязательны, последнее ищется по началу слова («котик» по
+    запросу «кот»). Кавычки экранируют слова, поэтому синтаксис FTS5
+    (``OR``, ``NEAR``, ``*``) из запроса не действует.
+    """
+    terms = TERM_RE.findall(query.lower())[:MAX_TERMS]
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_posts(query, group=None, author=None):
+    """Посты по запросу с ``search_rank``; сортировка — ``SEARCH_ORDERING``."""
+    posts = Post.objects.for_feed()
+    if group is not None:
+        posts = posts.filter(group=group)
+    if author is not None:
+        posts = posts.filter(author=author)
+    expression = match_expression(query)
+    no_rank = Value(0.0, output_field=FloatField())
+    if not expression:
+        # Курсор сортирует по search_rank и на пустой выдаче
+        return posts.annotate(search_rank=no_rank).none()
+    if connection.vendor != 'sqlite':
+        # Без FTS5: медленный, но работающий поиск по подстроке
+        return posts.filter(text__icontains=query).annotate(
+            search_rank=no_rank)
+    return (posts.filter(search__text__match=expression)
+            .annotate(search_rank=F('search__rank')))
@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import cache, feeds, stats
+from .models import Comment, Follow, Group, Post, UserStats
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.author_id, posts_count=1)
+        feeds.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.bump(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.user_id, following_count=1)
+        stats.bump(instance.author_id, followers_count=1)
+        # Подписчик сверх лимита: посты автора читаются при показе
+        feeds.stop_fanout(user_id=instance.author_id)
+        feeds.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    stats.bump(instance.user_id, following_count=-1)
+    stats.bump(instance.author_id, followers_count=-1)
+    # Автора под лимитом вернёт к раскладке команда refill_feeds, а не
+    # запрос отписки (см. feeds.py)
+    feeds.prune(instance.user_id, instance.author_id)
+
+
+# Инвалидация кэша: каждое изменение открывает новое поколение
+# у затронутых областей (см. cache.py)
+
+@receiver(post_init, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    # Чтобы при переносе поста в другую группу сбросить и старую
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    # Группа поста обычно уже загружена формой; запрос нужен только
+    # за старой группой при переносе
+    slugs = [instance.group.slug] if instance.group_id else []
+    old_group_id = instance._initial_group_id
+    if old_group_id and old_group_id != instance.group_id:
+        slugs += Group.objects.filter(pk=old_group_id).values_list(
+            'slug', flat=True)
+    # Описание группы (group:<slug>) пост не меняет: только её ленту
+    group_feeds = [cache.group_feed_ns(slug) for slug in slugs]
+    lists = [cache.FEED, cache.author_feed_ns(instance.author_id),
+             *group_feeds]
+    # Число записей меняют новый и удалённый пост, а правка — только при
+    # переносе в другую группу
+    if kwargs.get('created') or kwargs['signal'] is post_delete:
+        counted = lists
+    elif old_group_id != instance.group_id:
+        counted = group_feeds
+    else:
+        counted = []
+    cache.bump(cache.post_ns(instance.pk), cache.author_ns(instance.author_id),
+               *lists, *[cache.count_ns(feed) for feed in counted])
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    namespaces = [cache.post_ns(instance.post_id)]
+    # Число комментариев видно и в карточках лент
+    post = (Post.objects.filter(pk=instance.post_id)
+            .values_list('author_id', 'group__slug').first())
+    if post is not None:
+        author_id, slug = post
+        namespaces += [cache.FEED, cache.author_feed_ns(author_id)]
+        if slug:
+            namespaces.append(cache.group_feed_ns(slug))
+    cache.bump(*namespaces)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    # Название группы есть в карточках любых лент
+    cache.bump(cache.group_ns(instance.slug), cache.SITE)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    cache.bump(cache.follow_ns(instance.user_id),
+               cache.author_ns(instance.user_id),
+               cache.author_ns(instance.author_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_author(sender, instance, created=False, update_fields=None,
+                      **kwargs):
+    # Вход на сайт обновляет только last_login — профиль не меняется
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    cache.bump(cache.author_ns(instance.pk))
+    # Имя автора есть в карточках и комментариях на любых страницах; у
+    # нового пользователя их ещё нет
+    if not created:
+        cache.bump(cache.SITE)
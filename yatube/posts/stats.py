@@ -0,0 +1,58 @@
+"""Денормализованные счётчики профиля (модель UserStats)."""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+
+from .models import Follow, Post, UserStats
+
+User = get_user_model()
+
+COUNTERS = ('posts_count', 'followers_count', 'following_count')
+
+
+def bump(user_id, **deltas):
+    """Атомарно сдвигает счётчики: ``bump(1, posts_count=1)``.
+
+    Строку не создаёт: при каскадном удалении пользователя её уже нет,
+    а отсутствующую строку восстановит ``get_stats`` или ``recount_stats``.
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    return UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def count_for(user_ids):
+    """Честно пересчитывает счётчики для пачки пользователей."""
+    counters = {user_id: dict.fromkeys(COUNTERS, 0) for user_id in user_ids}
+    sources = (
+        ('posts_count', Post.objects, 'author_id'),
+        ('followers_count', Follow.objects, 'author_id'),
+        ('following_count', Follow.objects, 'user_id'),
+    )
+    for field, manager, column in sources:
+        rows = (manager.filter(**{f'{column}__in': user_ids})
+                .order_by().values(column)
+                .annotate(total=Count('*')).values_list(column, 'total'))
+        for user_id, total in rows:
+            counters[user_id][field] = total
+    return counters
+
+
+def save_counts(counters):
+    """Записывает посчитанные значения двумя пакетными запросами."""
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in counters],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.bulk_update(
+        [UserStats(user_id=user_id, **values)
+         for user_id, values in counters.items()],
+        COUNTERS,
+    )
+
+
+def get_stats(user):
+    """Счётчики пользователя; отсутствующая строка создаётся пересчётом."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        save_counts(count_for([user.pk]))
+        return UserStats.objects.get(user=user)
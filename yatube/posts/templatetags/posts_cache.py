@@ -0,0 +1,20 @@
+from django import template
+
+from posts import cache
+
+register = template.Library()
+
+
+@register.simple_tag
+def cache_version(*parts):
+    """Версия для ключа ``{% cache %}`` из поколений областей.
+
+    Аргументы идут парами «вид, идентификатор»::
+
+        {% cache_version "author" author.pk "group" group.slug as version %}
+
+    Пустая строка — кэшировать нельзя.
+    """
+    namespaces = [f'{kind}:{ident}'
+                  for kind, ident in zip(parts[::2], parts[1::2])]
+    return cache.version(*namespaces)
@@ -0,0 +1,23 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def card_thumbnail(post):
+    """Готовая миниатюра картинки поста или None.
+
+    Заодно проставляет ``post.webp_srcset``. Обычно вьюха уже подготовила
+    миниатюры всей страницы (``thumbnails.attach_thumbnails``). Тег только
+    читает KV-хранилище: миниатюры создаёт пул после загрузки картинки
+    или после промаха здесь, а пока их нет, шаблон показывает оригинал::
+
+        {% card_thumbnail post as im %}
+    """
+    if not post.image:
+        return None
+    if not hasattr(post, 'thumbnail'):
+        thumbnails.attach_thumbnails([post])
+    return post.thumbnail
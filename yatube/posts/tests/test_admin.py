@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser('Admin', 'a@a.ru', 'pass')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(AdminChangelistTests.admin)
+
+    def add_rows(self, count):
+        for i in range(count):
+            author = User.objects.create_user(f'Author{Post.objects.count()}')
+            post = Post.objects.create(text=f'Кот номер {i}', author=author,
+                                       group=AdminChangelistTests.group)
+            Comment.objects.create(post=post, author=author, text='Мяу')
+
+    def queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_changelists_do_not_query_per_row(self):
+        """Число запросов списка не растёт с числом строк"""
+        for model in ('post', 'comment'):
+            url = reverse(f'admin:posts_{model}_changelist')
+            with self.subTest(model=model):
+                self.add_rows(1)
+                few = len(self.queries(url))
+                self.add_rows(5)
+                self.assertEqual(len(self.queries(url)), few)
+
+    def test_post_search_uses_full_text_index(self):
+        """Поиск постов в админке идёт по индексу FTS5, а не LIKE"""
+        self.add_rows(2)
+        Post.objects.create(text='Собака', author=AdminChangelistTests.admin)
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url, {'q': 'собака'})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Собака'])
+        sql = ' '.join(self.queries(url, q='собака'))
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('LIKE', sql)
@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import cache
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class GenerationInvalidationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.reader = User.objects.create_user('Reader')
+        cls.group = Group.objects.create(title='GroupTest', slug='test-slug',
+                                         description='GroupDescription')
+        cls.other_group = Group.objects.create(title='Other', slug='other',
+                                               description='Other')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def assertBumps(self, namespaces, action):
+        before = cache.generations(namespaces)
+        action()
+        after = cache.generations(namespaces)
+        for namespace in namespaces:
+            with self.subTest(namespace=namespace):
+                self.assertNotEqual(before[namespace], after[namespace])
+
+    def test_comment_bumps_post(self):
+        """Комментарий открывает новое поколение поста"""
+        post = GenerationInvalidationTests.post
+        self.assertBumps(
+            [cache.post_ns(post.pk)],
+            lambda: Comment.objects.create(
+                post=post, author=GenerationInvalidationTests.reader,
+                text='Комментарий'))
+
+    def test_moving_post_bumps_both_groups(self):
+        """Перенос поста сбрасывает и старую, и новую группу"""
+        post = Post.objects.get(pk=GenerationInvalidationTests.post.pk)
+
+        def move():
+            post.group = GenerationInvalidationTests.other_group
+            post.save()
+
+        self.assertBumps([cache.group_feed_ns('test-slug'),
+                          cache.group_feed_ns('other'), cache.FEED,
+                          cache.post_ns(post.pk),
+                          cache.author_ns(post.author_id)], move)
+
+    def test_saving_post_with_loaded_group_needs_no_group_query(self):
+        """Сохранение поста с загруженной группой не ищет её заново"""
+        post = Post.objects.select_related('group').get(
+            pk=GenerationInvalidationTests.post.pk)
+        post.text = 'Исправленный пост'
+        # UPDATE поста и ни одного SELECT из posts_group
+        with self.assertNumQueries(1):
+            post.save(update_fields=['text'])
+
+    def test_follow_and_new_post_keep_card_versions(self):
+        """Подписка и новый пост автора не сбрасывают его карточки"""
+        post = Post.objects.for_feed().get(
+            pk=GenerationInvalidationTests.post.pk)
+        version = cache.attach_versions([post])[0].cache_version
+        Follow.objects.create(user=GenerationInvalidationTests.reader,
+                              author=GenerationInvalidationTests.author)
+        Post.objects.create(text='Ещё пост',
+                            author=GenerationInvalidationTests.author,
+                            group=GenerationInvalidationTests.group)
+        self.assertEqual(cache.attach_versions([post])[0].cache_version,
+                         version)
+        Comment.objects.create(post=post,
+                               author=GenerationInvalidationTests.reader,
+                               text='Комментарий')
+        self.assertNotEqual(cache.attach_versions([post])[0].cache_version,
+                            version)
+
+    def test_follow_bumps_both_users(self):
+        """Подписка сбрасывает подписки читателя и профили обоих"""
+        reader = GenerationInvalidationTests.reader
+        author = GenerationInvalidationTests.author
+        self.assertBumps(
+            [cache.follow_ns(reader.pk), cache.author_ns(reader.pk),
+             cache.author_ns(author.pk)],
+            lambda: Follow.objects.create(user=reader, author=author))
+
+    def test_cached_profile_card_sees_new_follower(self):
+        """Закэшированная карточка профиля обновляется после подписки"""
+        author = GenerationInvalidationTests.author
+        url = reverse('profile', args=[author.username])
+        self.assertContains(Client().get(url), 'Подписчиков: 0')
+        Follow.objects.create(user=GenerationInvalidationTests.reader,
+                              author=author)
+        self.assertContains(Client().get(url), 'Подписчиков: 1')
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.readers = [User.objects.create_user(f'Reader{i}')
+                       for i in range(3)]
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.quiet_post = Post.objects.create(text='Тихий', author=cls.author)
+        for i in range(12):
+            Comment.objects.create(post=cls.post,
+                                   author=cls.readers[i % 3],
+                                   text=f'Комментарий {i}')
+        Comment.objects.create(post=cls.quiet_post, author=cls.readers[0],
+                               text='Единственный')
+
+    def setUp(self):
+        self.client = Client()
+
+    def post_url(self, post):
+        return reverse('post_view', args=[post.author.username, post.pk])
+
+    def fragment_url(self, post):
+        return reverse('post_comments',
+                       args=[post.author.username, post.pk])
+
+    def test_thread_is_read_page_by_page(self):
+        """Первая страница — на странице поста, следующие — фрагментами"""
+        post = CommentThreadTests.post
+        response = self.client.get(self.post_url(post))
+        page = response.context['comments']
+        texts = [comment.text for comment in page]
+        self.assertEqual(texts[0], 'Комментарий 11')
+        cursor = page.paginator.next_cursor
+        while cursor:
+            response = self.client.get(self.fragment_url(post),
+                                       {'cursor': cursor})
+            self.assertNotContains(response, '<html')
+            page = response.context['comments']
+            texts += [comment.text for comment in page]
+            cursor = page.paginator.next_cursor
+        self.assertEqual(texts,
+                         [f'Комментарий {i}' for i in reversed(range(12))])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_more_link_works_without_javascript(self):
+        """Ссылка «Показать ещё» ведёт на страницу поста с курсором"""
+        post = CommentThreadTests.post
+        response = self.client.get(self.post_url(post))
+        cursor = response.context['comments'].paginator.next_cursor
+        self.assertContains(response, 'Показать ещё')
+        response = self.client.get(self.post_url(post), {'cursor': cursor})
+        self.assertEqual([comment.text for comment in
+                          response.context['comments']],
+                         [f'Комментарий {i}' for i in range(6, 1, -1)])
+
+    def test_queries_do_not_depend_on_thread_size(self):
+        """Авторы комментариев читаются тем же запросом, что и ветка"""
+        counts = []
+        for post in (CommentThreadTests.post, CommentThreadTests.quiet_post):
+            for url in (self.post_url(post), self.fragment_url(post)):
+                # Прогрев счётчиков поколений и миниатюр
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as captured:
+                    self.client.get(url)
+                counts.append(len(captured))
+        self.assertEqual(counts[:2], counts[2:])
+
+    def test_fragment_of_missing_post_is_404(self):
+        """Фрагмент чужого или несуществующего поста — 404"""
+        post = CommentThreadTests.post
+        response = self.client.get(
+            reverse('post_comments', args=['Reader0', post.pk]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,115 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.reader = User.objects.create_user('Reader')
+        cls.group = Group.objects.create(title='GroupTest', slug='test-slug',
+                                         description='GroupDescription')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        self.guest = Client()
+        self.reader = Client()
+        self.reader.force_login(ConditionalGetTests.reader)
+
+    def urls(self):
+        post = ConditionalGetTests.post
+        return [
+            reverse('index'),
+            reverse('group_posts', args=[ConditionalGetTests.group.slug]),
+            reverse('profile', args=[post.author.username]),
+            reverse('post_view', args=[post.author.username, post.pk]),
+        ]
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Совпавший ETag даёт 304 без запросов страницы и шаблона"""
+        # Профилю и посту нужен один запрос: автор по имени
+        for url, queries in zip(self.urls(), [0, 0, 1, 1]):
+            with self.subTest(url=url):
+                response = self.guest.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                with self.assertNumQueries(queries):
+                    response = self.guest.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_new_post_changes_feed_pages(self):
+        """Новый пост меняет ETag главной, группы и профиля"""
+        urls = self.urls()[:3]
+        etags = [self.guest.get(url)['ETag'] for url in urls]
+        Post.objects.create(text='Новый', author=ConditionalGetTests.author,
+                            group=ConditionalGetTests.group)
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Новый')
+
+    def test_comment_changes_every_page_with_the_post(self):
+        """Комментарий меняет страницу поста и счётчик в карточках лент"""
+        urls = self.urls()
+        etags = [self.guest.get(url)['ETag'] for url in urls]
+        Comment.objects.create(post=ConditionalGetTests.post,
+                               author=ConditionalGetTests.reader,
+                               text='Комментарий')
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_profile_and_post(self):
+        """Подписка меняет счётчики и кнопку на профиле и странице поста"""
+        urls = self.urls()[2:]
+        etags = [self.reader.get(url)['ETag'] for url in urls]
+        Follow.objects.create(user=ConditionalGetTests.reader,
+                              author=ConditionalGetTests.author)
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.reader.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        """Гость не получит 304 на ETag страницы вошедшего пользователя"""
+        url = reverse('index')
+        etag = self.reader.get(url)['ETag']
+        self.assertNotEqual(self.guest.get(url)['ETag'], etag)
+        response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_for_guests(self):
+        """Гость может сверяться по If-Modified-Since, вошедший — нет"""
+        url = self.urls()[3]
+        # Изменение должно быть хотя бы на секунду старше ответа
+        later = time.time() + 2
+        with mock.patch('posts.conditional.time.time', return_value=later):
+            response = self.guest.get(url)
+            self.assertTrue(response.has_header('Last-Modified'))
+            response = self.guest.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse(
+                self.reader.get(url).has_header('Last-Modified'))
+
+    def test_missing_pages_still_404(self):
+        """Для несуществующих страниц валидаторов нет"""
+        post = ConditionalGetTests.post
+        for url in [reverse('profile', args=['nobody']),
+                    reverse('post_view', args=[post.author.username, 0])]:
+            with self.subTest(url=url):
+                response = self.guest.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,111 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import export
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.reader = User.objects.create_user('Reader')
+        cls.staff = User.objects.create_user('Staff', is_staff=True)
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                         group=cls.group) for i in range(5)]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'export.ndjson.gz')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_rows(self, data):
+        return [json.loads(line)
+                for line in gzip.decompress(data).decode().splitlines()]
+
+    def run_export(self):
+        call_command('export_data', output=self.path, chunk_size=2,
+                     stdout=StringIO())
+        with open(self.path, 'rb') as file:
+            return file.read()
+
+    def test_command_exports_every_model_in_order(self):
+        """Группы, посты, комментарии и подписки — в порядке зависимостей"""
+        rows = self.read_rows(self.run_export())
+        self.assertEqual([row['model'] for row in rows],
+                         ['posts.group'] + ['posts.post'] * 5
+                         + ['posts.comment', 'posts.follow'])
+        post = rows[1]
+        self.assertEqual(post['pk'], ExportTests.posts[0].pk)
+        self.assertEqual(post['fields']['author'], ExportTests.author.pk)
+        self.assertEqual(post['fields']['text'], 'Пост 0')
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_tables_are_read_in_chunks(self):
+        """Каждая пачка — один запрос, таблица не читается целиком"""
+        # Посты: 3 пачки и пустой запрос; остальные — пачка и пустой
+        with self.assertNumQueries(4 + 2 * 3):
+            chunks = list(export.chunks(chunk_size=2))
+        self.assertEqual(max(data.count(b'\n') for _, _, data in chunks), 2)
+
+    def test_interrupted_export_resumes_from_checkpoint(self):
+        """Оборванная выгрузка продолжается и совпадает с полной"""
+        complete = self.read_rows(self.run_export())
+        original = export.gzip_member
+        calls = []
+
+        def failing_member(data):
+            calls.append(data)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return original(data)
+
+        with mock.patch('posts.export.gzip_member', failing_member):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_export()
+        with open(f'{self.path}.checkpoint') as file:
+            self.assertEqual(json.load(file)['model'], 'posts.post')
+        self.assertEqual(self.read_rows(self.run_export()), complete)
+
+    def test_staff_endpoint_streams_gzip(self):
+        """Сотрудник получает выгрузку потоком и может продолжить её"""
+        client = Client()
+        client.force_login(ExportTests.staff)
+        url = reverse('core:export')
+        response = client.get(url)
+        self.assertTrue(response.streaming)
+        rows = self.read_rows(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 8)
+        after = f'posts.post:{ExportTests.posts[2].pk}'
+        response = client.get(url, {'after': after})
+        rows = self.read_rows(b''.join(response.streaming_content))
+        self.assertEqual([row['model'] for row in rows],
+                         ['posts.post'] * 2
+                         + ['posts.comment', 'posts.follow'])
+        response = client.get(url, {'after': 'auth.user:1'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_endpoint_is_staff_only(self):
+        """Обычный пользователь выгрузку не получит"""
+        client = Client()
+        client.force_login(ExportTests.reader)
+        response = client.get(reverse('core:export'))
+        self.assertEqual(response.status_code, 302)
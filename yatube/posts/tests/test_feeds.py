@@ -0,0 +1,134 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import FeedEntry, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.reader = User.objects.create_user('Reader')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FollowFeedTests.reader)
+
+    def follow(self):
+        self.reader_client.get(
+            reverse('profile_follow', args=[FollowFeedTests.author]))
+
+    def feed(self):
+        response = self.reader_client.get(reverse('follow_index'))
+        return list(response.context['page'].object_list)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дополняет ленту, отписка её чистит"""
+        self.follow()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FollowFeedTests.reader,
+            post=FollowFeedTests.old_post).exists())
+        self.reader_client.get(
+            reverse('profile_unfollow', args=[FollowFeedTests.author]))
+        self.assertFalse(FeedEntry.objects.filter(
+            user=FollowFeedTests.reader).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков"""
+        self.follow()
+        post = Post.objects.create(text='Новый пост',
+                                   author=FollowFeedTests.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FollowFeedTests.reader, post=post).exists())
+        self.assertEqual(self.feed(), [post, FollowFeedTests.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора не пишутся в ленты, но видны в них"""
+        self.follow()
+        post = Post.objects.create(text='Пост для миллионов',
+                                   author=FollowFeedTests.author)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=FollowFeedTests.reader).exists())
+        self.assertEqual(self.feed(), [post, FollowFeedTests.old_post])
+
+    def stats(self):
+        return UserStats.objects.get(user=FollowFeedTests.author)
+
+    @override_settings(FEED_FANOUT_LIMIT=1, FEED_FANOUT_RESUME_LIMIT=0)
+    def test_author_near_limit_does_not_flap(self):
+        """Отписка у границы не возвращает автора к раскладке"""
+        self.follow()
+        other = User.objects.create_user('Other')
+        for _ in range(2):
+            Follow.objects.create(user=other, author=FollowFeedTests.author)
+            self.assertTrue(self.stats().feed_pull)
+            post = Post.objects.create(text='Пост сверх лимита',
+                                       author=FollowFeedTests.author)
+            feeds_before = FeedEntry.objects.count()
+            # Удаление, два счётчика и чистка ленты отписавшегося — без
+            # заполнения лент остальных подписчиков
+            with self.assertNumQueries(5):
+                Follow.objects.filter(user=other).delete()
+            self.assertEqual(FeedEntry.objects.count(), feeds_before)
+            self.assertTrue(self.stats().feed_pull)
+            self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+            self.assertEqual(self.feed()[0], post)
+
+    @override_settings(FEED_FANOUT_LIMIT=1, FEED_FANOUT_RESUME_LIMIT=1)
+    def test_refill_feeds_returns_author_to_fan_out(self):
+        """Команда refill_feeds раскладывает посты, опубликованные сверх
+        лимита, и возвращает автора к раскладке"""
+        self.follow()
+        other = User.objects.create_user('Other')
+        Follow.objects.create(user=other, author=FollowFeedTests.author)
+        post = Post.objects.create(text='Пост сверх лимита',
+                                   author=FollowFeedTests.author)
+        Follow.objects.filter(user=other).delete()
+        # Пока команда не прошла, пост подмешивается при чтении
+        self.assertEqual(self.feed(), [post, FollowFeedTests.old_post])
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        out = StringIO()
+        call_command('refill_feeds', stdout=out)
+        self.assertIn('Возвращено к раскладке авторов: 1', out.getvalue())
+        self.assertFalse(self.stats().feed_pull)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=FollowFeedTests.reader, post=post).exists())
+        self.assertEqual(self.feed(), [post, FollowFeedTests.old_post])
+        new_post = Post.objects.create(text='Снова раскладывается',
+                                       author=FollowFeedTests.author)
+        self.assertTrue(FeedEntry.objects.filter(post=new_post).exists())
+
+    def test_feed_is_listed_by_cursor_across_sources(self):
+        """Курсор ленты проходит и материализованные, и прямые посты"""
+        self.follow()
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}',
+                                author=FollowFeedTests.author)
+        celebrity = User.objects.create_user('Celebrity')
+        with override_settings(FEED_FANOUT_LIMIT=0):
+            Follow.objects.create(user=FollowFeedTests.reader,
+                                  author=celebrity)
+        Post.objects.create(text='Пост знаменитости', author=celebrity)
+        self.assertFalse(FeedEntry.objects.filter(author=celebrity).exists())
+        seen = []
+        response = self.reader_client.get(reverse('follow_index'))
+        while True:
+            paginator = response.context['page'].paginator
+            seen.extend(response.context['page'].object_list)
+            if not paginator.next_cursor:
+                break
+            response = self.reader_client.get(
+                reverse('follow_index'), {'cursor': paginator.next_cursor})
+        expected = list(Post.objects.filter(
+            author__following__user=FollowFeedTests.reader))
+        self.assertEqual(seen, expected)
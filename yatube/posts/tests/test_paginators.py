@@ -0,0 +1,201 @@
+import re
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(POSTS_PER_PAGE=4, PAGINATOR_MAX_PAGE=3)
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user('Test')
+        for i in range(10):
+            Post.objects.create(text=f'Запись {i}', author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def walk(self, url):
+        """Проходит ленту по ссылкам «старше» и собирает id записей."""
+        seen = []
+        response = self.guest_client.get(url)
+        while True:
+            page = response.context['page']
+            seen.extend(post.id for post in page.object_list)
+            if not page.paginator.next_cursor:
+                return seen, response
+            response = self.guest_client.get(
+                url, {'cursor': page.paginator.next_cursor})
+
+    def test_cursor_walk_visits_every_post_once(self):
+        """Проход по курсорам выдаёт все записи по одному разу по порядку"""
+        seen, _ = self.walk(reverse('index'))
+        expected = list(Post.objects.values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_newer_page(self):
+        """Ссылка «новее» возвращает предыдущую страницу"""
+        first = self.guest_client.get(reverse('index'))
+        second = self.guest_client.get(
+            reverse('index'),
+            {'cursor': first.context['page'].paginator.next_cursor})
+        back = self.guest_client.get(
+            reverse('index'),
+            {'cursor': second.context['page'].paginator.previous_cursor})
+        self.assertEqual(list(back.context['page'].object_list),
+                         list(first.context['page'].object_list))
+        self.assertIsNone(back.context['page'].paginator.previous_cursor)
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору не выполняет COUNT(*)"""
+        first = self.guest_client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(
+                reverse('index'),
+                {'cursor': first.context['page'].paginator.next_cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('"__count"', query['sql'])
+
+    def cursor_page_plans(self, client, url, cursor):
+        """Планы запросов страницы по курсору, читающих ленту."""
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            client.get(url, {'cursor': cursor})
+        plans = []
+        for sql, params in statements:
+            if 'ORDER BY' not in sql or 'LIMIT' not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plans.append([row[-1] for row in cursor.fetchall()])
+        return plans
+
+    def test_cursor_page_reads_index_range(self):
+        """Страница по курсору — диапазон индекса, а не его проход"""
+        reader = User.objects.create_user('Reader')
+        Follow.objects.create(user=reader, author=self.user)
+        client = Client()
+        client.force_login(reader)
+        # Поиск по индексу с условием на дату курсора: (… pub_date<?)
+        bounded = re.compile(r'^SEARCH .* USING .*INDEX .*[<>]\?\)$')
+        for url in (reverse('index'), reverse('follow_index')):
+            first = client.get(url).context['page'].paginator
+            second = client.get(url, {'cursor': first.next_cursor})
+            for cursor in (first.next_cursor,
+                           second.context['page'].paginator.previous_cursor):
+                plans = self.cursor_page_plans(client, url, cursor)
+                self.assertTrue(plans, url)
+                for plan in plans:
+                    with self.subTest(url=url, plan=plan):
+                        self.assertRegex(plan[0], bounded)
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный токен курсора даёт первую страницу"""
+        response = self.guest_client.get(reverse('index'),
+                                         {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['page'][0],
+                         Post.objects.first())
+
+    def test_numbered_pages_work_only_when_shallow(self):
+        """Старые ссылки ?page=N работают до PAGINATOR_MAX_PAGE"""
+        response = self.guest_client.get(reverse('index'), {'page': 3})
+        self.assertEqual(len(response.context['page']), 2)
+        response = self.guest_client.get(reverse('index'), {'page': 4})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+@override_settings(POSTS_PER_PAGE=1, PAGINATOR_MAX_PAGE=50)
+class NumberedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user('Test')
+        for i in range(20):
+            Post.objects.create(text=f'Запись {i}', author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_navigation_shows_window_of_pages(self):
+        """Навигация — окно вокруг текущей страницы, первая и последняя"""
+        windows = {
+            1: [1, 2, 3, None, 20],
+            4: [1, 2, 3, 4, 5, 6, None, 20],
+            10: [1, None, 8, 9, 10, 11, 12, None, 20],
+            20: [1, None, 18, 19, 20],
+        }
+        for number, window in windows.items():
+            with self.subTest(page=number):
+                response = self.guest_client.get(reverse('index'),
+                                                 {'page': number})
+                self.assertEqual(response.context['page'].window, window)
+        self.assertNotContains(response, '?page=17"')
+
+    @override_settings(PAGINATOR_MAX_PAGE=5)
+    def test_window_ends_at_last_served_page(self):
+        """Последняя ссылка — последняя страница, которую отдадут"""
+        response = self.guest_client.get(reverse('index'), {'page': 1})
+        self.assertEqual(response.context['page'].window, [1, 2, 3, 4, 5])
+        response = self.guest_client.get(reverse('index'), {'page': 5})
+        self.assertNotContains(response, '?page=6"')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url, {'page': 2})
+        return response, sum(query['sql'].startswith('SELECT COUNT(*)')
+                             for query in queries.captured_queries)
+
+    def test_count_is_cached_until_feed_changes(self):
+        """COUNT(*) ленты выполняется один раз до нового поста"""
+        counts = self.count_queries
+        for url in (reverse('index'), reverse('profile', args=['Test'])):
+            with self.subTest(url=url):
+                counts(url)
+                response, queries = counts(url)
+                self.assertEqual(queries, 0)
+                self.assertEqual(response.context['page'].paginator.count,
+                                 Post.objects.count())
+                Post.objects.create(text='Новая', author=self.user)
+                response, queries = counts(url)
+                self.assertEqual(queries, 1)
+                self.assertEqual(response.context['page'].paginator.count,
+                                 Post.objects.count())
+
+    def test_count_survives_comments_and_edits(self):
+        """Комментарий и правка поста не сбрасывают число записей"""
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        post = Post.objects.first()
+        post.group = group
+        post.save()
+        urls = (reverse('index'), reverse('profile', args=['Test']),
+                reverse('group_posts', args=['group']))
+        for url in urls:
+            self.count_queries(url)
+        Comment.objects.create(post=post, author=self.user,
+                               text='Комментарий')
+        post.text = 'Правка'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url)[1], 0)
+        # Перенос в другую группу меняет состав её ленты
+        post.group = None
+        post.save()
+        response, queries = self.count_queries(urls[2])
+        self.assertEqual(queries, 1)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
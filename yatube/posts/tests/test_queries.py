@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class FeedQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.reader = User.objects.create_user('Reader')
+        cls.group = Group.objects.create(title='GroupTest', slug='test-slug',
+                                         description='GroupDescription')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(6):
+            post = Post.objects.create(text=f'Запись {i}', author=cls.author,
+                                       group=cls.group)
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text='Комментарий')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueryBudgetTests.reader)
+
+    def test_feeds_use_constant_number_of_queries(self):
+        """Число запросов ленты не растёт с размером страницы"""
+        urls = {
+            reverse('index'): self.guest_client,
+            reverse('group_posts', args=['test-slug']): self.guest_client,
+            reverse('profile', args=['Author']): self.authorized_client,
+            reverse('follow_index'): self.authorized_client,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                self.assertQueriesDoNotGrow(client, url)
+
+    def test_comment_count_is_annotated(self):
+        """Число комментариев приходит в выборке ленты"""
+        response = self.guest_client.get(reverse('index'))
+        self.assertEqual(response.context['page'][0].comment_count, 1)
@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+from .utils import QueryPlanMixin
+
+User = get_user_model()
+
+
+# Одна запись на странице: у каждой ленты есть страница по курсору
+@override_settings(POSTS_PER_PAGE=1, COMMENTS_PER_PAGE=1)
+class QueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.reader = User.objects.create_user('Reader')
+        cls.group = Group.objects.create(title='GroupTest', slug='test-slug',
+                                         description='GroupDescription')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(3):
+            cls.post = Post.objects.create(text=f'Запись {i}',
+                                           author=cls.author,
+                                           group=cls.group)
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text='Комментарий')
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Ещё комментарий')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryPlanTests.reader)
+
+    def test_views_use_indexes(self):
+        """Запросы лент, поста и подписок идут по индексам без сортировки"""
+        post = QueryPlanTests.post
+        urls = {
+            reverse('index'): self.guest_client,
+            reverse('group_posts', args=['test-slug']): self.guest_client,
+            reverse('profile', args=['Author']): self.authorized_client,
+            reverse('post_view', args=['Author', post.pk]):
+                self.authorized_client,
+            reverse('post_comments', args=['Author', post.pk]):
+                self.guest_client,
+            reverse('follow_index'): self.authorized_client,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                self.assertIndexedPlans(client, url)
+            # Вторая и следующие страницы — поиск позиции курсора в индексе
+            with self.subTest(url=url, cursor=True):
+                cursor = self.next_cursor(client, url)
+                self.assertIndexedPlans(client, url, {'cursor': cursor})
+
+    def test_numbered_pages_use_indexes(self):
+        """Старые ссылки ?page=N тоже идут по индексам"""
+        for url in (reverse('group_posts', args=['test-slug']),
+                    reverse('profile', args=['Author'])):
+            with self.subTest(url=url):
+                self.assertIndexedPlans(self.authorized_client, url,
+                                        {'page': 1})
+        # COUNT(*) всей ленты читает самый узкий индекс целиком; число
+        # кэшируется до нового поста (FeedPaginator.count)
+        self.assertIndexedPlans(
+            self.authorized_client, reverse('index'), {'page': 1},
+            allowed=('SCAN posts_post USING COVERING INDEX',))
+        # Старая лента подписок сливает ленты всех авторов и сортирует;
+        # по курсору она читается из FeedEntry без сортировки
+        self.assertIndexedPlans(self.authorized_client,
+                                reverse('follow_index'), {'page': 1},
+                                allowed=('USE TEMP B-TREE FOR ORDER BY',))
+
+    def test_harness_reports_scans_and_sorts(self):
+        """Проверка действительно находит полный проход и сортировку"""
+        self.assertEqual(
+            self.bad_plan_steps(
+                'SELECT * FROM posts_comment ORDER BY text', []),
+            ['SCAN posts_comment', 'USE TEMP B-TREE FOR ORDER BY'])
+
+    def test_search_sorts_only_matches(self):
+        """Поиск читает индекс FTS5; сортируются только совпадения"""
+        url = reverse('search')
+        cursor = self.next_cursor(self.guest_client, url, {'q': 'запись'})
+        for data in ({'q': 'запись'}, {'q': 'запись', 'cursor': cursor}):
+            with self.subTest(data=data):
+                self.assertIndexedPlans(
+                    self.guest_client, url, data,
+                    # Ранжирование по bm25 требует отсортировать найденное
+                    allowed=('USE TEMP B-TREE FOR ORDER BY',))
+
+    def test_harness_rejects_index_walk_on_cursor_page(self):
+        """На странице по курсору проход индекса с начала — ошибка"""
+        sql = 'SELECT id FROM posts_post ORDER BY pub_date DESC, id DESC '
+        walk = ['SCAN posts_post USING COVERING INDEX post_pub_date_id_idx']
+        self.assertEqual(self.bad_plan_steps(f'{sql}LIMIT 2', []), [])
+        self.assertEqual(
+            self.bad_plan_steps(f'{sql}LIMIT 2', [], keyset=True), walk)
+        self.assertEqual(self.bad_plan_steps(sql, []), walk)
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Group, Post
+from posts.search import match_expression, search_posts
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.other = User.objects.create_user('Other')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+        cls.cat = Post.objects.create(text='Котик спит на солнце',
+                                      author=cls.author, group=cls.group)
+        cls.cats = Post.objects.create(text='Кот, кот и ещё один кот',
+                                       author=cls.other)
+        cls.dog = Post.objects.create(text='Собака гуляет', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query, **filters):
+        return list(search_posts(query, **filters)
+                    .order_by('search_rank', 'id'))
+
+    def test_ranked_prefix_search(self):
+        """Ищется по началу слова, частое слово поднимает пост выше"""
+        self.assertEqual(self.found('кот'),
+                         [SearchTests.cats, SearchTests.cat])
+        self.assertEqual(self.found('СОБАК'), [SearchTests.dog])
+        self.assertEqual(self.found('кот собака'), [])
+
+    def test_filters(self):
+        """Поиск сужается группой и автором"""
+        self.assertEqual(self.found('кот', group=SearchTests.group),
+                         [SearchTests.cat])
+        self.assertEqual(self.found('кот', author=SearchTests.other),
+                         [SearchTests.cats])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.get(pk=SearchTests.dog.pk)
+        post.text = 'Собака спит'
+        post.save()
+        self.assertEqual(self.found('гуляет'), [])
+        self.assertEqual(self.found('спит собака'), [post])
+        post.delete()
+        self.assertEqual(self.found('собака'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 из запроса не ломают поиск"""
+        self.assertEqual(match_expression('NEAR("кот" OR*'),
+                         '"near" "кот" "or"*')
+        self.assertEqual(match_expression('  ,,, '), '')
+        for query in ('NEAR("кот" OR*', '', ',,,'):
+            with self.subTest(query=query):
+                response = Client().get(reverse('search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_view_pages_keep_query(self):
+        """Страницы результатов листаются курсором с тем же запросом"""
+        client = Client()
+        response = client.get(reverse('search'), {'q': 'кот'})
+        seen = [post.pk for post in response.context['page']]
+        while response.context['page'].paginator.next_cursor:
+            paginator = response.context['page'].paginator
+            self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&cursor=')
+            response = client.get(reverse('search'), {
+                'q': 'кот', 'cursor': paginator.next_cursor})
+            seen.extend(post.pk for post in response.context['page'])
+        self.assertEqual(seen, [SearchTests.cats.pk, SearchTests.cat.pk])
+
+    def test_empty_query_shows_no_results(self):
+        """Пустой или отсутствующий q — пустая выдача, а не ошибка"""
+        self.assertEqual(self.found(''), [])
+        for params in ({}, {'q': ''}, {'q': '   '}):
+            with self.subTest(params=params):
+                response = Client().get(reverse('search'), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context['page']), [])
+
+    def test_unknown_filter_is_404(self):
+        """Несуществующая группа в фильтре — 404"""
+        response = Client().get(reverse('search'),
+                                {'q': 'кот', 'group': 'missing'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user('Author')
+        cls.reader = User.objects.create_user('Reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_posts_and_follows(self):
+        """Счётчики меняются при создании и удалении постов и подписок"""
+        post = Post.objects.create(text='Пост', author=UserStatsTests.author)
+        follow = Follow.objects.create(user=UserStatsTests.reader,
+                                       author=UserStatsTests.author)
+        self.assertEqual(self.stats(UserStatsTests.author).posts_count, 1)
+        self.assertEqual(
+            self.stats(UserStatsTests.author).followers_count, 1)
+        self.assertEqual(
+            self.stats(UserStatsTests.reader).following_count, 1)
+
+        post.delete()
+        follow.delete()
+        author_stats = self.stats(UserStatsTests.author)
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(
+            self.stats(UserStatsTests.reader).following_count, 0)
+
+    def test_repeated_follow_is_counted_once(self):
+        """Повторная подписка не создаёт вторую запись и не сбивает счётчики"""
+        client = Client()
+        client.force_login(UserStatsTests.reader)
+        url = reverse('profile_follow', args=[UserStatsTests.author.username])
+        client.get(url)
+        client.get(url)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            self.stats(UserStatsTests.author).followers_count, 1)
+
+    def test_profile_card_reads_stats(self):
+        """Карточка профиля показывает счётчики без COUNT(*)"""
+        Post.objects.create(text='Пост', author=UserStatsTests.author)
+        UserStats.objects.filter(user=UserStatsTests.author).update(
+            followers_count=42)
+        response = Client().get(
+            reverse('profile', args=[UserStatsTests.author.username]))
+        self.assertContains(response, 'Подписчиков: 42')
+        self.assertContains(response, 'Записей: 1')
+
+    def test_recount_stats_fixes_drift(self):
+        """Команда recount_stats восстанавливает счётчики"""
+        Post.objects.create(text='Пост', author=UserStatsTests.author)
+        Follow.objects.create(user=UserStatsTests.reader,
+                              author=UserStatsTests.author)
+        UserStats.objects.filter(user=UserStatsTests.author).update(
+            posts_count=100, followers_count=-3)
+        UserStats.objects.filter(user=UserStatsTests.reader).delete()
+
+        call_command('recount_stats', batch_size=1, stdout=StringIO())
+
+        author_stats = self.stats(UserStatsTests.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            self.stats(UserStatsTests.reader).following_count, 1)
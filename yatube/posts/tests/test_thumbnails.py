@@ -0,0 +1,188 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from posts import cache as posts_cache
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+
+def make_image(name='photo.png', size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+class ThumbnailMediaMixin:
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.media = override_settings(MEDIA_ROOT=self.media_root)
+        self.media.enable()
+        # Ключи sorl-thumbnail в общем файловом кэше переживают прогон тестов
+        cache.clear()
+
+    def tearDown(self):
+        self.media.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().tearDown()
+
+    def thumbnail_files(self):
+        found = []
+        for _, _, files in os.walk(os.path.join(self.media_root, 'cache')):
+            found.extend(files)
+        return found
+
+
+class RenderThumbnailTests(ThumbnailMediaMixin, TestCase):
+    def test_render_queues_missing_thumbnail(self):
+        """Страница не обрабатывает картинку сама, а снова ставит её в пул"""
+        author = User.objects.create_user('Author')
+        post = Post.objects.create(text='Пост', author=author,
+                                   image=make_image())
+        self.addCleanup(thumbnails._pending.discard, post.image.name)
+        executor = mock.Mock()
+        with mock.patch.object(thumbnails, '_get_executor',
+                               return_value=executor):
+            response = Client().get(reverse('index'))
+            # Повторный промах не ставит картинку второй раз
+            Client().get(reverse('index'))
+        executor.submit.assert_called_once_with(
+            thumbnails._run, post.pk, post.image.name)
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertEqual(self.thumbnail_files(), [])
+        self.assertIsNone(thumbnails.lookup(post.image))
+
+    def test_lost_job_is_retried(self):
+        """Задачу, потерянную с процессом, ставит следующий промах"""
+        author = User.objects.create_user('Author')
+        post = Post.objects.create(text='Пост', author=author,
+                                   image=make_image())
+        executor = mock.Mock()
+        with mock.patch.object(thumbnails, '_get_executor',
+                               return_value=executor):
+            thumbnails.attach_thumbnails([post])
+            # Процесс перезапустился: задачи в памяти нет, отметка в
+            # общем кэше истекла
+            thumbnails._pending.discard(post.image.name)
+            cache.clear()
+            thumbnails.attach_thumbnails([post])
+        thumbnails._pending.discard(post.image.name)
+        self.assertEqual(executor.submit.call_count, 2)
+
+    def test_command_makes_missing_thumbnails(self):
+        """make_thumbnails создаёт миниатюры старых картинок"""
+        author = User.objects.create_user('Author')
+        posts = [Post.objects.create(text=f'Пост {i}', author=author,
+                                     image=make_image(f'photo{i}.png'))
+                 for i in range(2)]
+        Post.objects.create(text='Без картинки', author=author)
+        thumbnails.generate(posts[0].pk, posts[0].image.name)
+        out = StringIO()
+        call_command('make_thumbnails', stdout=out)
+        self.assertIn('Проверено постов: 2, миниатюры созданы для 1',
+                      out.getvalue())
+        self.assertIsNotNone(thumbnails.lookup(posts[1].image))
+        self.assertEqual(len(self.thumbnail_files()),
+                         2 * len(thumbnails.CARD_VARIANTS))
+
+    def test_page_thumbnails_are_fetched_in_one_batch(self):
+        """Миниатюры всей страницы читаются одним запросом, затем из кэша"""
+        author = User.objects.create_user('Author')
+        posts = [Post.objects.create(text=f'Пост {i}', author=author,
+                                     image=make_image(f'photo{i}.png'))
+                 for i in range(3)]
+        for post in posts:
+            thumbnails.generate(post.pk, post.image.name)
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            thumbnails.attach_thumbnails(posts)
+        with self.assertNumQueries(0):
+            thumbnails.attach_thumbnails(posts)
+        for post in posts:
+            with self.subTest(post=post.text):
+                expected = thumbnails.lookup(post.image)
+                self.assertEqual(post.thumbnail.name, expected.name)
+                self.assertEqual(post.thumbnail.size, [960, 339])
+
+        response = Client().get(reverse('index'))
+        for post in posts:
+            self.assertContains(response, f'src="{post.thumbnail.url}"')
+
+    def test_generate_resets_feeds(self):
+        """Готовая миниатюра сбрасывает ETag лент с этим постом"""
+        author = User.objects.create_user('Author')
+        post = Post.objects.create(text='Пост', author=author,
+                                   image=make_image())
+        namespaces = [posts_cache.post_ns(post.pk), posts_cache.FEED,
+                      posts_cache.author_feed_ns(author.pk)]
+        before = posts_cache.generations(namespaces)
+        thumbnails.generate(post.pk, post.image.name)
+        after = posts_cache.generations(namespaces)
+        for namespace in namespaces:
+            with self.subTest(namespace=namespace):
+                self.assertNotEqual(after[namespace], before[namespace])
+
+
+class UploadThumbnailTests(ThumbnailMediaMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user('Author', password='pass')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def wait_for_pool(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while thumbnails._pending:
+            self.assertLess(time.monotonic(), deadline,
+                            'Пул не создал миниатюры вовремя')
+            time.sleep(0.05)
+
+    def test_upload_creates_thumbnail(self):
+        """Пул создаёт миниатюру после загрузки, страница её показывает"""
+        with mock.patch.object(thumbnails, 'generate',
+                               wraps=thumbnails.generate) as generate:
+            self.client.post(reverse('new_post'),
+                             {'text': 'Пост', 'image': make_image()})
+            self.wait_for_pool()
+        # Картинку обрабатывал поток пула, а не запрос
+        self.assertEqual(generate.call_count, 1)
+        post = Post.objects.get()
+        thumbnail = thumbnails.lookup(post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(len(self.thumbnail_files()),
+                         len(thumbnails.CARD_VARIANTS))
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+
+        response = Client().get(reverse('index'))
+        self.assertContains(response, f'src="{thumbnail.url}"')
+        # WebP-варианты для srcset тоже готовы
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '.webp 480w')
+        self.assertContains(response, '.webp 960w')
+
+    def test_edit_with_new_image_creates_thumbnail(self):
+        """Новая картинка при редактировании тоже получает миниатюру"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.client.post(
+            reverse('post_edit', args=[self.author.username, post.pk]),
+            {'text': 'Пост', 'image': make_image('other.png')})
+        self.wait_for_pool()
+        post.refresh_from_db()
+        self.assertIsNotNone(thumbnails.lookup(post.image))
@@ -0,0 +1,55 @@
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from posts.forms import PostForm
+
+
+def make_jpeg(size, exif=None):
+    buffer = io.BytesIO()
+    options = {'exif': exif} if exif else {}
+    Image.new('RGB', size, 'teal').save(buffer, 'JPEG', **options)
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+def camera_exif():
+    exif = Image.Exif()
+    exif[0x0110] = 'Camera'  # Model
+    exif[0x0112] = 6  # Orientation: повернуть на 90°
+    return exif.tobytes()
+
+
+@override_settings(POST_IMAGE_MAX_SIDE=800)
+class PostImageIngestTests(TestCase):
+    def clean(self, upload):
+        form = PostForm({'text': 'Пост'}, {'image': upload})
+        form.is_valid()
+        return form
+
+    def test_large_original_is_downscaled(self):
+        """Большой оригинал уменьшается до POST_IMAGE_MAX_SIDE"""
+        form = self.clean(make_jpeg((2000, 1000)))
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (800, 400))
+            self.assertEqual(image.format, 'JPEG')
+
+    def test_exif_is_stripped_and_applied(self):
+        """EXIF удаляется, а поворот из него применяется к пикселям"""
+        form = self.clean(make_jpeg((400, 200), exif=camera_exif()))
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(image.size, (200, 400))
+
+    def test_small_clean_upload_is_kept(self):
+        """Небольшую картинку без EXIF не пересжимаем"""
+        upload = make_jpeg((400, 200))
+        form = self.clean(upload)
+        self.assertIs(form.cleaned_data['image'], upload)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_are_rejected(self):
+        """Слишком большое по пикселям изображение не принимается"""
+        form = self.clean(make_jpeg((100, 100)))
+        self.assertIn('image', form.errors)
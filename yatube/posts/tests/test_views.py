@@ -209,19 +209,32 @@ class TaskPagesTests(TestCase):
         self.assertNotEqual(one_post.group.title, self.task.group.title)
 
     # Проверка работы кэша
-    def test_post_with_group_appears_correctly_on_home(self):
-        """Кэш на главной странице работает корректно"""
-        # Кэшируем главную страницу
-        response = self.authorized_client.get(reverse('index'))
-        # Создаем новый пост
+    def test_new_post_appears_on_cached_home(self):
+        """Новый пост сразу виден на главной, несмотря на кэш карточек"""
+        self.authorized_client.get(reverse('index'))
         Post.objects.create(
             text='New Text',
             author=TaskPagesTests.user,
         )
-        # Обновляем запрос к главной странице
-        cached_response = self.authorized_client.get(reverse('index'))
-        # Контент должен быть одинаковым т.к. все закэшировано
-        self.assertEqual(response.content, cached_response.content)
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'New Text')
+
+    def test_edited_post_is_not_served_from_cache(self):
+        """Изменение поста меняет ключ кэша его карточки"""
+        self.authorized_client.get(reverse('index'))
+        self.task.text = 'Edited text'
+        self.task.save()
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'Edited text')
+
+    def test_edit_button_is_not_cached_for_other_users(self):
+        """Кнопка редактирования не попадает к чужим читателям из кэша"""
+        edit_url = reverse('post_edit', args=[TaskPagesTests.user.username,
+                                              self.task.id])
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, edit_url)
+        response = self.authorized_client2.get(reverse('index'))
+        self.assertNotContains(response, edit_url)
 
     def test_authorized_client_can_follow(self):
         """Авторизованный пользователь может подписываться и отписываться"""
@@ -0,0 +1,125 @@
+from contextlib import contextmanager, nullcontext
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверки числа SQL-запросов для страниц с лентами."""
+
+    def count_queries(self, client, url, per_page):
+        # Кэш шаблонов скрыл бы запросы второй отрисовки
+        cache.clear()
+        with override_settings(POSTS_PER_PAGE=per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+        self.assertEqual(len(response.context['page']), per_page,
+                         f'Для {url} не хватает записей для проверки')
+        return len(queries)
+
+    def assertQueriesDoNotGrow(self, client, url, small=1, large=5):
+        """Число запросов страницы не зависит от числа записей на ней.
+
+        В ленте по ``url`` должно быть не меньше ``large`` записей.
+        """
+        expected = self.count_queries(client, url, small)
+        actual = self.count_queries(client, url, large)
+        self.assertEqual(
+            actual, expected,
+            f'{url}: {expected} запросов на {small} записей, '
+            f'но {actual} на {large} — вероятно, N+1'
+        )
+
+
+class QueryPlanMixin:
+    """Проверка планов всех запросов страницы через EXPLAIN QUERY PLAN.
+
+    Запрос без индекса (``SCAN`` таблицы) или с сортировкой во временном
+    B-дереве считается ошибкой: на больших таблицах такие страницы
+    деградируют первыми. Проход по индексу (``SCAN … USING INDEX``)
+    допустим только в запросе с LIMIT и не на странице по курсору: там
+    выборка должна начинаться с поиска позиции курсора (``SEARCH``).
+    Планы проверяются без статистики и после ``ANALYZE``.
+    """
+    BAD_PLAN_STEPS = ('SCAN ', 'USE TEMP B-TREE')
+    # Виртуальная таблица FTS5 и константная строка — не полный проход
+    GOOD_SCANS = ('VIRTUAL TABLE', 'CONSTANT ROW')
+    INDEX_SCANS = ('USING INDEX', 'USING COVERING INDEX')
+
+    def capture_statements(self, client, url, data=None):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        cache.clear()
+        with connection.execute_wrapper(capture):
+            response = client.get(url, data)
+        self.assertEqual(response.status_code, 200, url)
+        return [(sql, params) for sql, params in statements
+                if sql.lstrip().upper().startswith('SELECT')]
+
+    def next_cursor(self, client, url, data=None):
+        """Курсор второй страницы ленты или комментариев по ``url``."""
+        response = client.get(url, data)
+        page = response.context.get('page') or response.context['comments']
+        self.assertTrue(page.paginator.next_cursor,
+                        f'{url}: в ленте одна страница')
+        return page.paginator.next_cursor
+
+    @contextmanager
+    def statistics(self, scale=100000):
+        """Планировщик со статистикой ``ANALYZE`` внутри блока.
+
+        В тестовой БД по несколько строк, и с такой статистикой любой
+        проход таблицы дёшев. Число строк в статистике умножается на
+        ``scale``, как в заполненной БД; выборочность индексов остаётся
+        такой, какой её измерил ``ANALYZE``.
+        """
+        # Откат точки сохранения убирает и sqlite_stat1, и её данные из
+        # памяти планировщика
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+                cursor.execute('SELECT rowid, stat FROM sqlite_stat1')
+                for rowid, stat in cursor.fetchall():
+                    rows, *rest = stat.split()
+                    cursor.execute(
+                        'UPDATE sqlite_stat1 SET stat = %s WHERE rowid = %s',
+                        [' '.join([str(int(rows) * scale), *rest]), rowid])
+                # Перечитывает изменённую статистику
+                cursor.execute('ANALYZE sqlite_master')
+            yield
+            transaction.set_rollback(True)
+
+    def bad_plan_steps(self, sql, params, allowed=(), keyset=False):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            steps = [row[-1] for row in cursor.fetchall()]
+        good = self.GOOD_SCANS
+        if not keyset and 'LIMIT' in sql:
+            good += self.INDEX_SCANS
+        return [step for step in steps
+                if step.startswith(self.BAD_PLAN_STEPS)
+                and not any(scan in step for scan in good)
+                and not step.startswith(tuple(allowed))]
+
+    def assertIndexedPlans(self, client, url, data=None, allowed=()):
+        """Все SELECT страницы идут по индексам и без сортировки.
+
+        ``allowed`` — начала шагов плана, допустимых для этой страницы.
+        Страница с ``cursor`` в ``data`` проверяется как страница по курсору.
+        """
+        keyset = 'cursor' in (data or {})
+        statements = self.capture_statements(client, url, data)
+        for analyzed in (False, True):
+            stats = self.statistics() if analyzed else nullcontext()
+            with stats:
+                for sql, params in statements:
+                    bad = self.bad_plan_steps(sql, params, allowed, keyset)
+                    self.assertFalse(
+                        bad, f'{url} (ANALYZE: {analyzed}): {bad} в плане '
+                             f'запроса\n{sql}')
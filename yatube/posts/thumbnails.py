@@ -0,0 +1,210 @@
+"""Миниатюры картинок постов готовятся при загрузке, а не при показе.
+
+Тег ``{% thumbnail %}`` сам создаёт миниатюру, если её ещё нет, поэтому
+первый читатель нового поста ждал, пока Pillow раскодирует, уменьшит
+и сохранит картинку. Теперь миниатюра создаётся в фоновом пуле потоков
+сразу после сохранения поста, а шаблон только ищет готовую в KV-хранилище
+sorl-thumbnail и никогда не обрабатывает картинку сам. Ни запрос
+загрузки, ни отрисовка страницы картинку не обрабатывают.
+
+Пул живёт в памяти процесса, и задачи теряются при перезапуске, а у
+картинок, загруженных раньше, миниатюр нет вовсе. Поэтому страница,
+не нашедшая миниатюру, снова ставит картинку в пул (не чаще раза в
+``RETRY_TIMEOUT`` на все процессы), а старые картинки обрабатывает
+команда ``make_thumbnails``.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from . import cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Миниатюра для карточки поста в формате оригинала
+CARD_GEOMETRY = '960x339'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+# WebP-варианты той же карточки для srcset: узкие экраны берут меньший
+WEBP_GEOMETRIES = ('480x170', '960x339')
+WEBP_OPTIONS = dict(CARD_OPTIONS, format='WEBP', quality=80)
+CARD_VARIANTS = ((CARD_GEOMETRY, CARD_OPTIONS),) + tuple(
+    (geometry, WEBP_OPTIONS) for geometry in WEBP_GEOMETRIES)
+
+# Сколько помнить, что миниатюры ещё нет: она вот-вот появится
+MISSING_TIMEOUT = 60
+# Сколько не ставить картинку в пул повторно: задача ещё идёт, потерялась
+# при перезапуске процесса или картинку не удалось обработать
+RETRY_TIMEOUT = 5 * 60
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def generate(post_id, image_name):
+    """Создаёт миниатюры картинки и сбрасывает страницы с этим постом.
+
+    Возвращает False, если картинку обработать не удалось.
+    """
+    try:
+        for geometry, options in CARD_VARIANTS:
+            get_thumbnail(image_name, geometry, **options)
+        # Карточка и ETag лент могли закэшироваться с оригиналом картинки
+        namespaces = [cache.post_ns(post_id), cache.FEED]
+        post = (Post.objects.filter(pk=post_id)
+                .values_list('author_id', 'group__slug').first())
+        if post is not None:
+            author_id, slug = post
+            namespaces.append(cache.author_feed_ns(author_id))
+            if slug:
+                namespaces.append(cache.group_feed_ns(slug))
+        cache.bump(*namespaces)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', image_name)
+        return False
+    return True
+
+
+def _run(post_id, image_name):
+    try:
+        generate(post_id, image_name)
+    finally:
+        with _lock:
+            _pending.discard(image_name)
+        # Соединения с БД этого потока не должны жить между задачами
+        connections.close_all()
+
+
+def _claim(image_name):
+    # Общий кэш: одна задача на картинку на все процессы сайта
+    return default.kvstore.cache.add(f'thumbnail-job:{image_name}', 1,
+                                     RETRY_TIMEOUT)
+
+
+def _submit(post_id, image_name):
+    with _lock:
+        # Повторное сохранение поста не ставит одну картинку дважды
+        if image_name in _pending:
+            return
+        _pending.add(image_name)
+    if not _claim(image_name):
+        with _lock:
+            _pending.discard(image_name)
+        return
+    _get_executor().submit(_run, post_id, image_name)
+
+
+def schedule(post):
+    """Ставит создание миниатюр поста в фоновый пул после коммита.
+
+    Команды управления, которым миниатюры нужны сразу, вызывают
+    ``generate`` сами.
+    """
+    if not post.image:
+        return
+    post_id, image_name = post.pk, post.image.name
+    # Поток должен увидеть уже сохранённый пост и файл
+    transaction.on_commit(lambda: _submit(post_id, image_name))
+
+
+def _thumbnail_options(source, options):
+    """Опции так же, как их дополняет ThumbnailBackend.get_thumbnail."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, geometry=CARD_GEOMETRY, options=CARD_OPTIONS):
+    """Будущий файл миниатюры: имя считается без обработки картинки."""
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _thumbnail_options(source, options))
+    return ImageFile(name, default.storage)
+
+
+def lookup(image):
+    """Готовая миниатюра из KV-хранилища или None, если её ещё нет."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image))
+
+
+def _fetch_raw(keys):
+    """Сырые значения KV-хранилища: один get_many и один запрос к БД.
+
+    Повторяет ``cached_db_kvstore.KVStore._get_raw`` для пачки ключей.
+    """
+    kv_cache = default.kvstore.cache
+    found = kv_cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = dict(KVStore.objects.filter(key__in=missing)
+                    .values_list('key', 'value'))
+        kv_cache.set_many(rows, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        kv_cache.set_many(
+            {key: EMPTY_VALUE for key in missing if key not in rows},
+            MISSING_TIMEOUT)
+        found.update(rows)
+    return {key: value for key, value in found.items()
+            if value is not EMPTY_VALUE}
+
+
+def attach_thumbnails(posts, retry=True):
+    """Проставляет миниатюры всей странице постов разом.
+
+    Вместо отдельного обращения к KV-хранилищу на каждую карточку —
+    один ``get_many`` к кэшу (и один запрос к БД для промахов).
+    ``post.thumbnail`` — миниатюра в формате оригинала или None, если её
+    ещё нет; ``post.webp_srcset`` — готовый srcset WebP-вариантов или
+    пустая строка. Картинки без миниатюр при ``retry`` снова ставятся
+    в пул.
+    """
+    posts = list(posts)
+    wanted = [(post, [add_prefix(thumbnail_file(post.image, *variant).key)
+                      for variant in CARD_VARIANTS])
+              for post in posts if post.image]
+    found = {}
+    if wanted:
+        found = {key: deserialize_image_file(value)
+                 for key, value in _fetch_raw(list({
+                     key for _, keys in wanted for key in keys})).items()}
+    for post in posts:
+        post.thumbnail, post.webp_srcset = None, ''
+    for post, keys in wanted:
+        files = [found.get(key) for key in keys]
+        post.thumbnail = files[0]
+        if all(files[1:]):
+            post.webp_srcset = ', '.join(
+                f'{file.url} {file.width}w' for file in files[1:])
+        if retry and not all(files):
+            _submit(post.pk, post.image.name)
+    return posts
@@ -0,0 +1,57 @@
+"""Приём картинок постов: ограничение размера, уменьшение и очистка EXIF.
+
+Оригиналы раньше сохранялись как есть: фото на 40 мегапикселей целиком
+раскодировалось при каждой обработке и занимало место на диске. Теперь:
+
+* размеры проверяются по заголовку файла, до раскодирования пикселей;
+* большие оригиналы уменьшаются до ``POST_IMAGE_MAX_SIDE`` по длинной
+  стороне, JPEG раскодируется сразу в уменьшенном масштабе (``draft``);
+* EXIF удаляется (геометка, модель камеры), а поворот из него
+  применяется к пикселям.
+
+Сами загрузки больше ``FILE_UPLOAD_MAX_MEMORY_SIZE`` Django и так пишет
+во временный файл, а не держит в памяти.
+"""
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+
+
+def too_large(width, height):
+    return width * height > settings.POST_IMAGE_MAX_PIXELS
+
+
+def _needs_processing(image):
+    if getattr(image, 'is_animated', False):
+        # Анимацию не пересобираем: уменьшение оставило бы один кадр
+        return False
+    return (max(image.size) > settings.POST_IMAGE_MAX_SIDE
+            or 'exif' in image.info)
+
+
+def normalize(upload):
+    """Уменьшенная копия загрузки без EXIF или сама загрузка, если
+    обрабатывать нечего."""
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if not _needs_processing(image):
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        # JPEG раскодируется сразу с уменьшением в 2/4/8 раз
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, image_format,
+                   **SAVE_OPTIONS.get(image_format, {}))
+    return ContentFile(buffer.getvalue(), name=upload.name)
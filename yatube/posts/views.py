@@ -1,56 +1,111 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
+from core import group_commit
+
+from . import cache, conditional, thumbnails
+from .cache import attach_versions
+from .feeds import FEED_ORDERING, follow_feed_queryset, follow_feed_sources
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
+from .paginators import CursorPaginator, MergedCursorPaginator, paginate
+from .search import SEARCH_ORDERING, search_posts
+from .stats import get_stats
 
 User = get_user_model()
 
+COMMENT_ORDERING = ('-created', '-id')
+
+
+def prepare_cards(posts):
+    """Версии кэша и миниатюры для всех карточек страницы разом."""
+    return thumbnails.attach_thumbnails(attach_versions(posts))
+
+
+def comment_page(post, cursor=None):
+    """Страница ветки комментариев по курсору, авторы — тем же запросом.
+
+    Сколько бы ни было комментариев, за раз читается не больше
+    ``COMMENTS_PER_PAGE`` строк по индексу (post, created).
+    """
+    paginator = CursorPaginator(post.comments.select_related('author'),
+                                settings.COMMENTS_PER_PAGE, COMMENT_ORDERING)
+    return paginator.get_page(cursor)
 
+
+@conditional.conditional_page(conditional.index_namespaces)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = paginate(request, post_list,
+                    namespaces=[cache.count_ns(cache.FEED)])
+    page.object_list = prepare_cards(page.object_list)
     form = PostForm()
     return render(request, 'index.html', {'page': page, 'form': form})
 
 
+@conditional.conditional_page(conditional.group_namespaces)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts_in_group.all()
-    paginator = Paginator(posts_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts_list = group.posts_in_group.for_feed()
+    page = paginate(request, posts_list,
+                    namespaces=[cache.count_ns(
+                        cache.group_feed_ns(group.slug))])
+    page.object_list = prepare_cards(page.object_list)
     return render(request, 'group.html', {'group': group, 'page': page})
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    paginator = CursorPaginator(search_posts(query, group, author),
+                                settings.POSTS_PER_PAGE, SEARCH_ORDERING)
+    page = paginator.get_page(request.GET.get('cursor'))
+    page.object_list = prepare_cards(page.object_list)
+    # Ссылки паджинатора сохраняют запрос и фильтры
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    context = {'page': page, 'query': query, 'group': group,
+               'author': author, 'page_query': params.urlencode()}
+    return render(request, 'search.html', context)
+
+
+@conditional.conditional_page(conditional.profile_namespaces)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts_list = author.author_posts.all()
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    posts_list = author.author_posts.for_feed()
     profile = author
-    paginator = Paginator(posts_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, posts_list,
+                    namespaces=[cache.count_ns(
+                        cache.author_feed_ns(author.pk))])
+    page.object_list = prepare_cards(page.object_list)
 
     following = (request.user.is_authenticated
                  and Follow.objects.filter(user=request.user,
                                            author=author).exists())
 
     context = {'author': author, 'page': page, 'following': following,
-               'profile': profile}
+               'profile': profile, 'stats': get_stats(author)}
 
     return render(request, 'profile.html', context)
 
 
+@conditional.conditional_page(conditional.post_namespaces)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__stats'),
+        id=post_id, author__username=username)
+    prepare_cards([post])
     author = post.author
-    comments = post.comments.all()
+    # Без JavaScript «Показать ещё» открывает ту же страницу с курсором
+    comments = comment_page(post, request.GET.get('cursor'))
     form = CommentForm(request.POST or None)
 
     following = (request.user.is_authenticated
@@ -58,11 +113,22 @@ def post_view(request, username, post_id):
                                            author=author).exists())
 
     context = {'author': author, 'post': post, 'comments': comments,
-               'form': form, 'following': following}
+               'form': form, 'following': following,
+               'stats': get_stats(author)}
 
     return render(request, 'post.html', context)
 
 
+@conditional.conditional_page(conditional.post_namespaces)
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев: фрагмент без обёртки страницы."""
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
+    comments = comment_page(post, request.GET.get('cursor'))
+    return render(request, 'includes/comment_list.html',
+                  {'post': post, 'comments': comments})
+
+
 @login_required
 def new_post(request):
     is_new_post = True
@@ -78,6 +144,7 @@ def new_post(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('index')
 
     return render(request, 'post_edit.html',
@@ -101,6 +168,7 @@ def post_edit(request, username, post_id):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            thumbnails.schedule(post)
             return redirect('post_edit', username=username, post_id=post_id)
 
     context = {'form': form, 'username': username, 'post': post,
@@ -116,7 +184,7 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.post = post
         comment.author = request.user
-        comment.save()
+        group_commit.run(comment.save)
     return redirect(reverse('post_view', args=[username, post_id]))
 
 
@@ -135,10 +203,15 @@ def server_error(request):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = MergedCursorPaginator(follow_feed_sources(request.user),
+                                      settings.POSTS_PER_PAGE, FEED_ORDERING)
+    # Число записей ленты подписок меняется и с подписками, и с любым
+    # новым или удалённым постом
+    page = paginate(request, follow_feed_queryset(request.user),
+                    cursor_paginator=paginator,
+                    namespaces=[cache.follow_ns(request.user.pk),
+                                cache.count_ns(cache.FEED)])
+    page.object_list = prepare_cards(page.object_list)
     return render(request, 'follow.html', {'page': page})
 
 
@@ -146,9 +219,10 @@ def follow_index(request):
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=user, author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    if user != author:
+        # Повторная подписка (двойной клик) не нарушит unique_follow
+        group_commit.run(Follow.objects.get_or_create, user=user,
+                         author=author)
     return redirect(reverse('profile', args=[username]))
 
 
@@ -158,5 +232,5 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     is_follower = Follow.objects.filter(user=user, author=author)
     if is_follower.exists():
-        Follow.objects.filter(user=user, author=author).delete()
+        group_commit.run(is_follower.delete)
     return redirect(reverse('profile', args=[username]))
@@ -10,11 +10,22 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Тесты (manage.py test и pytest) пишут свои файлы во временный каталог
+# и не трогают кэш и другие файлы запущенного рядом сервера
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    TEST_FILES_DIR = tempfile.mkdtemp(prefix='yatube-tests-')
+    atexit.register(shutil.rmtree, TEST_FILES_DIR, True)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -38,6 +49,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
     'about.apps.AboutConfig',
+    'core.apps.CoreConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,11 +62,15 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # Первым, чтобы учитывать время остальных (см. core/profiling.py)
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.SamplingProfilerMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -93,8 +109,36 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Сколько секунд ждать блокировку записи, а не падать сразу
+        'OPTIONS': {'timeout': 20},
+        # Соединение живёт между запросами: прагмы и кэш страниц не
+        # пропадают после каждого ответа
+        'CONN_MAX_AGE': 600,
     }
 }
+# Реплика для чтения лент (см. core/routers.py). Для проверки на месте —
+# копия db.sqlite3, путь к ней в YATUBE_REPLICA_DB; без неё алиас
+# смотрит в основной файл и не используется. В тестах реплика — та же БД
+REPLICA_DB = os.environ.get('YATUBE_REPLICA_DB')
+DATABASES['replica'] = dict(DATABASES['default'],
+                            NAME=REPLICA_DB or DATABASES['default']['NAME'],
+                            TEST={'MIRROR': 'default'})
+DATABASE_REPLICAS = ['replica'] if REPLICA_DB else []
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Маршруты, которые читают с реплик, и сколько секунд после POST
+# пользователь читает только из основной БД
+REPLICA_VIEWS = ['index', 'group_posts', 'profile', 'follow_index']
+REPLICA_STICKY_SECONDS = 10
+
+# Прагмы для каждого нового соединения SQLite (см. core/db.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — в килобайтах: 64 МБ
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
 
 
 # Password validation
@@ -151,10 +195,98 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 # Количество постов на странице в Paginator
 POSTS_PER_PAGE = 10
+# Комментариев на странице ветки; остальные подгружаются по курсору
+COMMENTS_PER_PAGE = 20
+# Глубже этой страницы ссылки ?page=N не обслуживаются (OFFSET слишком дорог),
+# дальше лента листается только по курсору
+PAGINATOR_MAX_PAGE = 50
+# Списки админки считают строки точно только до этого числа
+# (см. core/paginators.py)
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Лента подписок: посты авторов, у которых подписчиков больше лимита,
+# не раскладываются по лентам, а подмешиваются при чтении
+FEED_FANOUT_LIMIT = 10000
+# Обратно к раскладке (команда refill_feeds) — не больше стольких подписчиков
+FEED_FANOUT_RESUME_LIMIT = 8000
+# Сколько последних постов автора добавить в ленту при подписке
+FEED_BACKFILL_LIMIT = 1000
+
+# Потоки, создающие миниатюры картинок после загрузки (см. posts/thumbnails.py)
+THUMBNAIL_WORKERS = 2
+# Картинки постов: больше стольких пикселей не принимаем, а оригиналы
+# уменьшаем до такой длинной стороны (см. posts/uploads.py)
+POST_IMAGE_MAX_PIXELS = 50000000
+POST_IMAGE_MAX_SIDE = 2048
+
+# Групповой коммит комментариев и подписок (см. core/group_commit.py):
+# записи копятся до GROUP_COMMIT_WINDOW секунд и коммитятся одной
+# транзакцией; запрос ждёт коммита не дольше GROUP_COMMIT_TIMEOUT
+GROUP_COMMIT = os.environ.get('YATUBE_GROUP_COMMIT') == '1'
+GROUP_COMMIT_WINDOW = 0.002
+GROUP_COMMIT_MAX_BATCH = 100
+GROUP_COMMIT_TIMEOUT = 10
+
+# Метрики Prometheus: файлы воркеров (см. core/metrics.py) вне дерева
+# исходников
+METRICS_DIR = (
+    os.path.join(TEST_FILES_DIR, 'metrics') if TESTING
+    else os.environ.get('YATUBE_METRICS_DIR',
+                        os.path.join(tempfile.gettempdir(), 'yatube-metrics')))
+# Сборщик забирает метрики с заголовком «Authorization: Bearer <токен>»;
+# сотрудникам сайта токен не нужен
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+# Адреса, которым токен не нужен. За nginx или другим прокси все запросы
+# приходят с 127.0.0.1, поэтому по умолчанию список пуст
+METRICS_ALLOWED_IPS = []
+
+# Профайлер запросов (см. core/sampling.py): доля запросов, которые
+# профилируются без ?profile=1, и интервал снятия стека в секундах
+PROFILER_SAMPLE_RATE = 0.0
+PROFILER_INTERVAL = 0.005
+
+# Журнал медленных запросов к БД (см. core/slow_queries.py): порог в
+# секундах (None — выключено) и файл NDJSON с ротацией
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LOG = os.environ.get(
+    'YATUBE_SLOW_QUERY_LOG', os.path.join(BASE_DIR, 'slow_queries.ndjson'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
 
-# Кэширование
+# Кэширование: общий для всех воркеров файл SQLite (см. core/cache.py)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': (
+            os.path.join(TEST_FILES_DIR, 'cache.sqlite3') if TESTING
+            else os.environ.get('YATUBE_CACHE_PATH',
+                                os.path.join(BASE_DIR, 'cache.sqlite3'))),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
@@ -24,6 +24,7 @@ handler500 = 'posts.views.server_error'  # noqa
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('ops/', include('core.urls', namespace='core')),
     path('', include('posts.urls')),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),